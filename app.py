@@ -1,25 +1,102 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory
-from flask_socketio import SocketIO, emit
-import random
-import json
 import os
-from datetime import timedelta
-from functools import wraps
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Serving mode: 'threading' (one OS thread per connection) or 'eventlet' /
+# 'gevent' (cooperative I/O, for thousands of mostly idle connections). The
+# standard library must be patched before anything else is imported
+ASYNC_MODE = os.getenv('ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, g, abort
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import random
+import json
+import zlib
+import tempfile
+import atexit
+import signal
+import sys
+import threading
+import time
+import hmac
+import mimetypes
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import escape
+from game_state import GameState, EventRejected, QUESTION_CLOSED
+from rooms import RoomRegistry, valid_room_id
+from storage import create_storage, RoundArchive
+from bus import LocalBus, BusHub, SocketBus, BusManager
+from cluster import Primary, Replica
+from emitter import CoalescingEmitter
+from scheduler import DeadlineScheduler
+from ratelimit import TokenBucketLimiter, parse_budgets, retry_after_header
+import metrics
+from profiler import SamplingProfiler
+from assets import AssetManifest
+from wire import (WireJSONProvider, COMPACT_MEDIA_TYPE, COMPRESS_MIN_SIZE, compact, compact_channel,
+                  wants_compact, accepted_encoding, compress)
+
 app = Flask(__name__)
+# jsonify() also speaks the compact wire format (see wire.py)
+app.json = WireJSONProvider(app)
 # Load configuration from environment variables
 app.config.update(
     SECRET_KEY=os.getenv('SECRET_KEY', 'fallback_secret_key_for_development'),
     PERMANENT_SESSION_LIFETIME=timedelta(days=7),
-    SESSION_COOKIE_SECURE=True,
+    # Only turn off for plain-HTTP setups such as the local load test
+    SESSION_COOKIE_SECURE=os.getenv('SESSION_COOKIE_SECURE', 'true').lower() in ('1', 'true', 'yes'),
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE='Lax',
 )
 
+# Static files are served under fingerprinted names (see assets.py), which
+# url_for('static', filename=...) resolves to
+STATIC_BUILD_DIR = os.getenv('STATIC_BUILD_DIR', os.path.join(app.root_path, 'build', 'static'))
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 3600  # for paths without a fingerprint
+assets = AssetManifest(app.static_folder, STATIC_BUILD_DIR)
+assets.build()
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = assets.hashed_name(values['filename'])
+
+def serve_static(filename):
+    """Serves fingerprinted files as immutable, precompressed when the client accepts it.
+
+    Other paths, such as the avatar URLs stored in the game data, are served
+    from the static folder and may be cached for an hour.
+    """
+    if not assets.is_hashed(filename):
+        return send_from_directory(app.static_folder, filename, max_age=STATIC_MAX_AGE)
+    encoding = accepted_encoding()
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    if suffix is not None and os.path.exists(os.path.join(STATIC_BUILD_DIR, filename + suffix)):
+        response = send_from_directory(STATIC_BUILD_DIR, filename + suffix, max_age=STATIC_IMMUTABLE_MAX_AGE,
+                                       mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(STATIC_BUILD_DIR, filename, max_age=STATIC_IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+app.view_functions['static'] = serve_static
+
 # Constants with environment variables
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD')
 USER_PASSWORD = os.getenv('USER_PASSWORD')
@@ -28,14 +105,298 @@ USER_PASSWORD = os.getenv('USER_PASSWORD')
 if not ADMIN_PASSWORD or not USER_PASSWORD:
     raise ValueError("Critical environment variables are not set. Check your .env file.")
 
+# Game data lives in memory and is written back to disk in the background
+DATA_FILE = os.getenv('GAME_DATA_FILE', 'game_data.json')
+DATA_STORAGE = os.getenv('DATA_STORAGE', 'json')  # 'json', 'wal' or 'sqlite'
+DATA_FLUSH_INTERVAL = float(os.getenv('DATA_FLUSH_INTERVAL', '1.0'))
+DATA_SNAPSHOT_INTERVAL = float(os.getenv('DATA_SNAPSHOT_INTERVAL', '30'))
+DELTA_HISTORY = int(os.getenv('DELTA_HISTORY', '1000'))  # changes kept for clients catching up
+DATA_WAL_FSYNC = os.getenv('DATA_WAL_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+
+# Multi-worker mode (see workers.py): WORKERS processes share the game through
+# a message bus hosted by worker 0, the primary, on BUS_ADDRESS
+PORT = int(os.getenv('PORT', '5000'))
+WORKERS = int(os.getenv('WORKERS', '1'))
+WORKER_ID = int(os.getenv('WORKER_ID', '0'))
+BUS_ADDRESS = os.getenv('BUS_ADDRESS', '127.0.0.1:5100')
+MAX_CONNECTIONS = int(os.getenv('MAX_CONNECTIONS', '0'))  # Socket.IO connections per worker; 0 = no limit
+BROADCAST_WINDOW = float(os.getenv('BROADCAST_WINDOW', '0.05'))  # seconds emits are collected; 0 = send at once
+# Timed rounds (both 0 = the admin drives every round, as before)
+ANSWER_SECONDS = float(os.getenv('ANSWER_SECONDS', '0'))  # seconds to answer; 0 = until the admin opens the vote
+VOTING_SECONDS = float(os.getenv('VOTING_SECONDS', '0'))  # seconds to vote; 0 = until the admin reveals
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # lets a scraper read /metrics without an admin session
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # where the sampling profiler writes its profiles
+# Reverse proxies in front of the app whose X-Forwarded-For header is trusted; 0 = none
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+# Requests per second and burst each client gets, per endpoint or Socket.IO
+# event (see Rate Limits); RATE_LIMITS overrides some, e.g. 'vote=1:5,leaderboard=0'
+DEFAULT_RATE_LIMITS = ('submit_answer=1:5,vote=2:10,change_score=5:20,get_game_state=2:10,'
+                       'get_changes=5:20,leaderboard=2:10,connect=0.5:5')
+RATE_LIMITS = dict(parse_budgets(DEFAULT_RATE_LIMITS), **parse_budgets(os.getenv('RATE_LIMITS', '')))
+
+# Disk access of the data layer, run outside the event loop in the async modes
+def blocking_runner():
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute
+    if ASYNC_MODE == 'gevent':
+        from gevent import get_hub
+        return lambda fn, *args: get_hub().threadpool.apply(fn, args)
+    return None
+
+if WORKERS > 1:
+    if WORKER_ID == 0:
+        BusHub(BUS_ADDRESS).start()
+    bus = SocketBus(BUS_ADDRESS)
+else:
+    bus = LocalBus()
+cluster = Primary(bus) if WORKER_ID == 0 else Replica(bus, WORKER_ID)
+
+# Every room is a separate game with its own data files. The default room
+# keeps using DATA_FILE; the others live in ROOMS_DIR as <room id>.json
+DEFAULT_ROOM = 'main'
+ROOMS_DIR = os.getenv('ROOMS_DIR', 'rooms')
+
+def room_data_file(room_id):
+    if room_id == DEFAULT_ROOM:
+        return DATA_FILE
+    return os.path.join(ROOMS_DIR, f'{room_id}.json')
+
+def room_exists(room_id):
+    path = room_data_file(room_id)
+    base = os.path.splitext(path)[0]
+    return room_id == DEFAULT_ROOM or any(
+        os.path.exists(candidate) for candidate in (path, base + '.wal', base + '.db'))
+
+# Completed rounds of a room, next to its data file; only the primary writes to it
+def room_archive(room_id):
+    return RoundArchive(os.path.splitext(room_data_file(room_id))[0] + '.rounds.ndjson',
+                        fsync=DATA_WAL_FSYNC)
+
+def open_room(room_id):
+    if isinstance(cluster, Replica):
+        return cluster.open_room(room_id, lambda storage, forward: GameState(
+            storage, history=DELTA_HISTORY, forward=forward, archive=room_archive(room_id)))
+
+    path = room_data_file(room_id)
+    if room_id != DEFAULT_ROOM:
+        os.makedirs(ROOMS_DIR, exist_ok=True)
+    state = GameState(
+        create_storage(
+            DATA_STORAGE,
+            path,
+            os.path.splitext(path)[0] + '.backup.json',
+            fsync=DATA_WAL_FSYNC,
+            db_path=os.getenv('DATA_SQLITE_FILE') if room_id == DEFAULT_ROOM else None
+        ),
+        # With an event log every change is already on disk, so snapshots can be rare
+        flush_interval=DATA_SNAPSHOT_INTERVAL if DATA_STORAGE == 'wal' else DATA_FLUSH_INTERVAL,
+        history=DELTA_HISTORY,
+        run_blocking=blocking_runner(),
+        archive=room_archive(room_id)
+    )
+    # Deltas are only broadcast from here; the bus carries them to the other workers' clients
+    state.add_listener(lambda from_version, changes: broadcast_changes(room_id, state, from_version, changes))
+    cluster.follow(room_id, state)
+    # Phase deadlines too are only kept here, including one saved before a restart
+    state.add_event_listener(lambda events: schedule_phase_end(room_id, state, events))
+    schedule_phase_end(room_id, state)
+    return state
+
+# Timed rounds go answering -> voting -> reveal. The primary worker holds one
+# timer per room, for the end of its current phase
+scheduler = DeadlineScheduler()
+NEXT_PHASE = {'answering': 'voting', 'voting': 'reveal'}
+# Events that may change a room's phase
+PHASE_EVENTS = {'phase_started', 'current_question_set', 'votes_revealed', 'game_reset', 'game_imported'}
+
+def schedule_phase_end(room_id, room, events=None):
+    if events is not None and not any(event['type'] in PHASE_EVENTS for event in events):
+        return
+    phase = room.current_phase()
+    if phase is None or phase['deadline'] is None:
+        scheduler.cancel(room_id)
+        return
+    scheduler.schedule(room_id, phase['deadline'], lambda: phase_deadline_passed(room_id, room, phase))
+
+def phase_deadline_passed(room_id, room, phase):
+    try:
+        end_phase(room_id, room, phase)
+    except EventRejected:
+        # The admin moved on first
+        pass
+
+def end_phase(room_id, room, phase):
+    """Moves a room from ``phase`` to the next phase and returns it.
+
+    Ending the vote reveals the votes in the same batch, so the round is
+    scored exactly once. Raises EventRejected if the room is no longer in
+    ``phase``.
+    """
+    name = NEXT_PHASE[phase['name']]
+    seconds = phase['durations'].get(name, 0)
+    events = [{'type': 'phase_started', 'phase': name, 'from_phase': phase['name'],
+               'deadline': time.time() + seconds if seconds else None}]
+    if name == 'reveal':
+        events.append({'type': 'votes_revealed'})
+    results = room.commit_many(events)
+    if name == 'reveal':
+        emitter.emit('votes_revealed', to=room_channel(room_id))
+    return results[0]
+
+rooms = RoomRegistry(open_room, room_exists)
+if isinstance(cluster, Primary):
+    cluster.serve(rooms)
+    rooms.get(DEFAULT_ROOM)
+atexit.register(rooms.stop)
+
+# The room a request is about: the one picked with ?room=..., remembered in the session
+def request_room():
+    return session.get('room', DEFAULT_ROOM)
+
+def room_state():
+    if 'room_state' not in g:
+        g.room_state = rooms.get(request_room())
+        if g.room_state is None:
+            abort(404)
+    return g.room_state
+
+# The game state of the current request's room
+state = LocalProxy(room_state)
+
+# Socket.IO room that reaches every client of a game room
+def room_channel(room_id=None):
+    return f'room:{room_id or request_room()}'
+
+# The variant of a channel this socket joins: sockets opened with
+# ?wire=compact get every event in the compact format
+def socket_channel(channel):
+    return compact_channel(channel) if request.args.get('wire') == 'compact' else channel
+
 # Configure CORS properly for production
 socketio = SocketIO(app, 
     cors_allowed_origins="*",  # Allow all origins in development
     ping_timeout=60,
     ping_interval=25,
-    async_mode='threading'
+    async_mode=ASYNC_MODE,
+    # Relays emits to the clients connected to the other workers
+    client_manager=BusManager(bus) if WORKERS > 1 else None
 )
 
+# Wrapped around the Socket.IO middleware, so socket events see the client's
+# address too instead of the proxy's
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# All emits go out in batches, at most one per room every BROADCAST_WINDOW
+emitter = CoalescingEmitter(socketio, BROADCAST_WINDOW)
+
+# Deadlines that passed while the rooms were loading fire now
+scheduler.start()
+atexit.register(scheduler.stop)
+
+# Push every committed batch of changes to the clients of the room. Changes
+# about the current question (or about no question at all) go to everyone in
+# the room; changes about other questions only to sockets watching that
+# question. The 'state_delta' is sent even when it ends up empty, so clients
+# keep counting versions without a gap
+def broadcast_changes(room_id, room, from_version, changes):
+    current_question_id = room.current_question_id()
+    shared = []
+    scoped = {}
+    for change in changes:
+        question_id = change.get('question_id', current_question_id)
+        if question_id == current_question_id:
+            shared.append(change)
+        else:
+            scoped.setdefault(question_id, []).append(change)
+
+    emitter.emit_delta(room_channel(room_id), from_version, changes[-1]['version'], shared)
+    for question_id, question_changes in scoped.items():
+        emitter.emit_question_delta(f'{room_channel(room_id)}:question:{question_id}',
+                                    question_id, question_changes)
+
+# Instrumentation, served by /metrics
+REQUEST_SECONDS = metrics.histogram('quiz_http_request_duration_seconds',
+                                    'Time to handle an HTTP request', ['method', 'route'])
+REQUESTS = metrics.counter('quiz_http_requests_total', 'HTTP requests handled', ['method', 'route', 'status'])
+SOCKET_CONNECTIONS = metrics.gauge('quiz_socketio_connections', 'Open Socket.IO connections of this worker')
+REFUSED_CONNECTIONS = metrics.counter('quiz_socketio_connections_refused_total',
+                                      'Socket.IO connections refused because of MAX_CONNECTIONS')
+LOADED_ROOMS = metrics.gauge('quiz_rooms_loaded', 'Rooms held in memory by this worker')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+# Admission control: every client (the session's player, or else its IP
+# address) has a token bucket per budget in RATE_LIMITS. A client that used
+# up its budget gets an immediate 429 instead of a place in the queue, so
+# one misbehaving tab cannot slow the game down for everyone else
+limiter = TokenBucketLimiter(RATE_LIMITS)
+RATE_LIMITED = metrics.counter('quiz_rate_limited_total',
+                               'Requests, Socket.IO events and connections refused by the rate limiter', ['budget'])
+
+def admit(budget):
+    """Returns 0 if the current client may go ahead, else the seconds until it may.
+
+    Players are limited by username, everyone else by address; the admin is
+    not limited, so other clients can never lock them out.
+    """
+    if session.get('admin_authenticated', False):
+        return 0
+    wait = limiter.acquire(budget, session.get('username') or request.remote_addr)
+    if wait:
+        RATE_LIMITED.labels(budget).inc()
+    return wait
+
+@app.before_request
+def limit_request_rate():
+    if request.endpoint not in RATE_LIMITS:
+        return None
+    wait = admit(request.endpoint)
+    if not wait:
+        return None
+    response = jsonify({'success': False, 'message': 'Too many requests', 'retry_after': round(wait, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after_header(wait)
+    return response
+
+# Registered first, so it runs after the other after_request hooks and times them too
+@app.after_request
+def record_request_metrics(response):
+    # Labelled by URL rule, so e.g. every /static/<path:filename> request is one series
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if 'request_started' in g:
+        REQUEST_SECONDS.labels(request.method, route).observe(time.perf_counter() - g.request_started)
+    REQUESTS.labels(request.method, route, response.status_code).inc()
+    return response
+
+# Off until an admin starts it with POST /profiler
+profiler = SamplingProfiler(PROFILE_DIR)
+atexit.register(profiler.stop)
+
+@app.before_request
+def profile_request():
+    if profiler.running and request.url_rule is not None:
+        profiler.enter(request.url_rule.rule)
+
+@app.teardown_request
+def end_request_profile(exc):
+    if profiler.running:
+        profiler.leave()
+
+# ?room=<id> on any page or API call switches the session to that room
+@app.before_request
+def select_room():
+    room_id = request.args.get('room')
+    if room_id is None:
+        return None
+    if rooms.get(room_id) is None:
+        return jsonify({'success': False, 'message': 'Room not found'}), 404
+    session['room'] = room_id
+    return None
+
 # Custom decorator for requiring authentication
 def login_required(f):
     @wraps(f)
@@ -45,13 +406,35 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Helper function for safe file operations
-def safe_file_operation(operation, *args, **kwargs):
-    try:
-        return operation(*args, **kwargs)
-    except (IOError, json.JSONDecodeError) as e:
-        app.logger.error(f"File operation error: {str(e)}")
-        return None
+# Same for the admin-only API endpoints, which answer with JSON instead of a redirect
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('admin_authenticated', False):
+            return jsonify({'success': False, 'message': 'Admin login required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Rendered pages, per template, with placeholders for their per-user values
+page_cache = {}
+
+def render_page(template, **values):
+    """Renders a template once and serves the copy from then on, with ``values`` filled in.
+
+    The template may only output the values as they are, e.g. ``{{ username }}``;
+    they are HTML-escaped when filled in. While templates are reloaded on
+    change (debug mode), every call renders.
+    """
+    if app.jinja_env.auto_reload:
+        return render_template(template, **values)
+    parts = page_cache.get(template)
+    if parts is None:
+        placeholders = {name: f'\x00{name}\x00' for name in values}
+        html = render_template(template, **placeholders)
+        # Alternating literal HTML and value names
+        parts = html.split('\x00')
+        page_cache[template] = parts
+    return ''.join(part if i % 2 == 0 else str(escape(values[part])) for i, part in enumerate(parts))
 
 @app.route('/')
 @login_required
@@ -60,7 +443,7 @@ def home():
         return redirect(url_for('userlogin'))
     
     avatar = session.get('avatar')
-    return render_template('game.html', username=session['username'], avatar=avatar)
+    return render_page('game.html', username=session['username'], avatar=avatar)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -78,7 +461,7 @@ def login():
             app.logger.warning(f"Failed login attempt from IP: {request.remote_addr}")
             return jsonify({"success": False, "error": "Invalid password"}), 401
 
-    return render_template('login.html')
+    return render_page('login.html')
 
 @app.route('/logout', methods=['POST'])
 def logout():
@@ -99,7 +482,7 @@ def admin_login():
         else:
             return jsonify({"success": False, "error": "Invalid Admin Password."})
 
-    return render_template('admin_login.html')  # Admin login form
+    return render_page('admin_login.html')  # Admin login form
 
 @app.route('/userlogin', methods=['GET', 'POST'])
 def userlogin():
@@ -118,36 +501,20 @@ def userlogin():
         session['username'] = username.strip()
         session['avatar'] = avatar
 
-        # Read the current game_data.json
-        data = load_data()
-
-        # Check if the user already exists in the users list
-        user_exists = any(user['username'] == username.strip()
-                          for user in data['users'])
-
-        if not user_exists:
-            # Append the new user to the users array
-            new_user = {
-                "username": username.strip(),
-                "avatar": avatar,
-                "score": 0
-            }
-            data['users'].append(new_user)
-
-            # Write the updated data back to the JSON file
-            save_data(data)
+        # Add the user to the users list unless they already exist
+        commit_event({'type': 'user_joined', 'username': username.strip(), 'avatar': avatar})
 
         return jsonify({"success": True, "next": url_for('home')})
 
-    return render_template('userlogin.html')
+    return render_page('userlogin.html')
 
 @app.route('/admin')
 def admin_page():
     if not session.get('admin_authenticated', False):  # Check admin login
         return redirect(url_for('admin_login'))
 
-    data = load_data()  # Get the current data
-    return render_template('admin.html', users=data['users'])
+    # The page loads the game data itself, through the API
+    return render_page('admin.html')
 
 @app.route('/admin_logout', methods=['POST'])
 def admin_logout():
@@ -156,28 +523,94 @@ def admin_logout():
 
 @app.route('/get_users', methods=['GET'])
 def get_users():
-    data = load_data()
-    return jsonify({'users': data['users']})
+    return cached_json_response('users', lambda data: {'users': data['users']})
 
-# Load data from the JSON file
+# Get the in-memory game data. Hold state.lock while reading it, since the
+# writer thread may be changing it at the same time
 def load_data():
-    return safe_file_operation(
-        lambda: json.load(open('game_data.json', 'r', encoding='utf-8'))
-    ) or {"questions": [], "answers": [], "votes": [], "users": []}
+    return state.data
+
+# Apply a change to the game data; it is logged and persisted by the storage backend
+def commit_event(event):
+    return state.commit(event)
+
+# The question a read request is about: ?question_id=..., or else the current question
+def requested_question_id():
+    question_id = request.args.get('question_id', type=int)
+    if question_id is None:
+        question_id = state.current_question_id()
+    return question_id
+
+# Serialized read responses, keyed by name, each stored with the state version it was built from.
+# The names include client-chosen question IDs, so only the most recently used ones are kept
+RESPONSE_CACHE_SIZE = 256
+response_cache = OrderedDict()
+response_cache_lock = threading.Lock()
+
+def cached_json_response(name, build):
+    """Returns build(data) as JSON, serialized at most once per state version.
+
+    The same goes for the compact format and for each compression. The
+    response carries a strong ETag derived from the version and the
+    encoding the client accepts, as each pair always gets the same bytes,
+    so a client that already has it gets an empty 304 instead.
+    """
+    compact_format = wants_compact()
+    name = f"{request_room()}-{name}{'-compact' if compact_format else ''}"
+    accepted = accepted_encoding()
+    etag = f"{name}-{state.version}-{accepted or 'identity'}"
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    with response_cache_lock:
+        cached = response_cache.get(name)
+        if cached is not None:
+            response_cache.move_to_end(name)
+    if cached is None or cached[0] != state.version:
+        with state.lock:
+            payload = build(load_data())
+            if compact_format:
+                payload = compact(payload)
+            # Version, body, and the body per compression, filled in on demand
+            cached = (state.version, app.json.dumps(payload, separators=(',', ':')).encode('utf-8'), {})
+        with response_cache_lock:
+            response_cache[name] = cached
+            response_cache.move_to_end(name)
+            while len(response_cache) > RESPONSE_CACHE_SIZE:
+                response_cache.popitem(last=False)
+
+    body = cached[1]
+    encoding = accepted if len(body) >= COMPRESS_MIN_SIZE else None
+    if encoding is not None:
+        if encoding not in cached[2]:
+            cached[2][encoding] = compress(body, encoding)
+        body = cached[2][encoding]
 
-# Save data to the JSON file
-def save_data(data):
-    try:
-        # Create a backup before saving
-        if os.path.exists('game_data.json'):
-            os.replace('game_data.json', 'game_data.backup.json')
-        
-        with open('game_data.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        return True
-    except Exception as e:
-        app.logger.error(f"Error saving data: {str(e)}")
-        return False
+    response = app.response_class(
+        body, mimetype=COMPACT_MEDIA_TYPE if compact_format else 'application/json')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    response.set_etag(f"{name}-{cached[0]}-{accepted or 'identity'}")
+    # Let browsers keep the body but revalidate it on every request
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/leaderboard')
+def leaderboard():
+    """Returns a page of the players ranked by score, plus one player's rank.
+
+    ``?limit=`` (default 10, at most 100) and ``?offset=`` select the page;
+    the rank is reported for ``?username=``, or else for the logged-in player.
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 0), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    username = request.args.get('username') or session.get('username')
+
+    entries, total, me = state.leaderboard(offset, limit, username)
+    return jsonify({'version': state.version, 'total': total, 'entries': entries, 'me': me})
 
 @app.route('/change_score', methods=['POST'])
 def change_score():
@@ -185,305 +618,351 @@ def change_score():
     username = data.get('username')
     increment = data.get('increment')
 
-    # Load data from the JSON file
-    game_data = load_data()
-
-    # Find the user by username
-    user = next(
-        (user for user in game_data['users'] if user['username'] == username), None)
-
-    if user is None:
-        return jsonify({'success': False, 'message': 'User not found'})
-
     # Update the user's score
-    user['score'] += increment
-
-    # Save the updated data back to the JSON file
-    save_data(game_data)
+    try:
+        commit_event({'type': 'score_changed', 'username': username, 'delta': increment})
+    except EventRejected as e:
+        return jsonify({'success': False, 'message': e.message})
 
     return jsonify({'success': True})
 
 @app.route('/get_game_state')
 def get_game_state():
-    """Retrieves the current game state, including answers and votes."""
-    data = load_data()
-    # Prepend the path and extension to the avatar field
-    for answer in data['answers']:
-        # Check if the avatar doesn't already have a .webp extension
-        if not answer['avatar'].endswith('.webp'):
-            answer['avatar'] = answer['avatar'] + ".webp"
+    """Retrieves the current game state, with the answers and votes of one question.
+
+    Defaults to the current question; without one, all answers are returned.
+    """
+    question_id = requested_question_id()
 
-    return jsonify(data)
+    def build(data):
+        round_answers = data['answers'] if question_id is None else state.answers_for(question_id)
+        return dict(data, answers=with_avatar_files(round_answers), question_id=question_id)
+
+    return cached_json_response(f'game_state-{question_id}', build)
+
+# Prepend the path and extension to the avatar field
+def with_avatar_files(answers):
+    return [
+        # Check if the avatar doesn't already have a .webp extension
+        answer if answer['avatar'].endswith('.webp')
+        else dict(answer, avatar=answer['avatar'] + ".webp")
+        for answer in answers
+    ]
+
+@app.route('/history')
+def history():
+    """Returns a page of the completed rounds, newest first.
+
+    Each round has its question, the answers with their votes, the points it
+    awarded (empty if the votes were never revealed) and its ``round``
+    number. ``?limit=`` (default 10, at most 100) and ``?offset=`` select
+    the page.
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 0), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    rounds, total = state.history(offset, limit)
+    for archived in rounds:
+        archived['answers'] = with_avatar_files(archived['answers'])
+    return jsonify({'total': total, 'rounds': rounds})
+
+@app.route('/get_changes')
+def get_changes():
+    """Returns the changes made after the version the client already has.
+
+    Like /get_game_state, changes about other questions than ?question_id
+    (default: the current question) are left out.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'success': False, 'message': 'Missing since parameter'}), 400
+
+    result = state.changes_since(since, requested_question_id())
+    if result is None:
+        # Too far behind; the client should reload /get_game_state
+        return jsonify({'version': state.version, 'reset': True, 'changes': []})
+    changes, version = result
+    return jsonify({'version': version, 'reset': False, 'changes': changes})
 
 @app.route('/toggle_answer_visibility', methods=['POST'])
 def toggle_answer_visibility():
     """Toggles the visibility of a specific answer."""
-    data = load_data()
     answer_id = request.json.get('answer_id')
 
     # Find the answer by ID and toggle the 'visible' flag
-    for answer in data['answers']:
-        if answer['id'] == answer_id:
-            answer['visible'] = not answer['visible']  # Toggle visibility
-            break
-
-    save_data(data)
+    try:
+        visible = commit_event({'type': 'answer_visibility_toggled', 'answer_id': answer_id})
+    except EventRejected as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
 
     # Emit the updated visibility state to clients
-    socketio.emit('answer_visibility_changed', {
-                  'answer_id': answer_id, 'visible': not answer['visible']})
+    emitter.emit('answer_visibility_changed', {
+                 'answer_id': answer_id, 'visible': not visible}, to=room_channel(), key=answer_id)
 
-    return jsonify({'success': True, 'answer_id': answer_id, 'visible': not answer['visible']})
+    return jsonify({'success': True, 'answer_id': answer_id, 'visible': not visible})
 
 @app.route('/mark_correct', methods=['POST'])
 def mark_correct():
     data = request.get_json()
     answer_id = data.get('answer_id')
-    answers = data.get('answers')
 
-    # Find the answer by ID and toggle the 'is_correct' flag
-    for answer in answers:
-        if answer['id'] == answer_id:
-            if 'is_correct' not in answer:
-                # Initialize 'is_correct' if it doesn't exist
-                answer['is_correct'] = False
-            # Toggle the 'is_correct' flag
-            answer['is_correct'] = not answer['is_correct']
-            break
-
-    # Update the game data without altering 'reveal'
-    full_data = load_data()
-    full_data['answers'] = answers  # Update answers only
-    save_data(full_data)
-
-    # Emit the updated answers to clients
-    socketio.emit('updated_answers', {'answers': answers})
+    # Toggle the 'is_correct' flag on the server's copy of the answer
+    # Clients hear about it from the 'correct_changed' change in the next state delta
+    try:
+        is_correct = commit_event({'type': 'answer_correct_toggled', 'answer_id': answer_id})
+    except EventRejected as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
 
-    return jsonify({'success': True, 'answers': answers})
+    return jsonify({'success': True, 'answer_id': answer_id, 'is_correct': is_correct})
 
 @app.route('/get_questions')
 def get_questions():
     """Fetches all questions for the admin to choose the next question."""
-    data = load_data()
-    questions = data.get("questions", [])
-    return jsonify({"questions": questions})
+    return cached_json_response('questions', lambda data: {"questions": data.get("questions", [])})
 
-@app.route('/submit_answer', methods=['POST'])
-def submit_answer():
-    """Handles the submission of answers along with user information and avatar."""
-    answer_text = request.json['answer']
-    question_id = request.json['question_id']
-    avatar = request.json['avatar']
+# Answers and votes arrive over HTTP or, from the game page, as Socket.IO
+# events acknowledged with the same result. Both return (body, status)
+
+def record_answer(data):
+    """Records an answer by the session's player, along with their avatar."""
+    answer_text = data.get('answer')
+    avatar = data.get('avatar')
+    if answer_text is None or avatar is None:
+        return {"success": False, "message": "Missing required fields"}, 400
+    question_id = state.current_question_id()
+    # An answer to a question that was on screen before the admin moved on
+    # is refused, like a late answer of a timed round, before it is queued
+    if data.get('question_id') not in (None, question_id):
+        return {"success": False, "message": QUESTION_CLOSED}, 409
+    refusal = state.phase_refusal(question_id, 'answering')
+    if refusal is not None:
+        return {"success": False, "message": refusal}, 409
 
     # Retrieve username from session
     username = session.get('username')
 
-    data = load_data()
-    answer_id = len(data['answers']) + 1
-    data['answers'].append({
-        "id": answer_id,
-        "question_id": question_id,
-        "text": answer_text,
-        "username": username,  # Store username with the answer
-        "avatar": avatar,
-        "votes": [],  # Initialize empty vote list for each answer
-        "random_num": random.randint(1, 1000),
-        "visible": False
-    })
-
-    save_data(data)
-    return jsonify(success=True)
-
-@app.route('/vote', methods=['POST'])
-def vote():
-    """Handles voting for an answer, ensuring unique votes by each user."""
-    # Get the request data
-    data = request.get_json()
+    try:
+        commit_event({
+            'type': 'answer_submitted',
+            'question_id': question_id,
+            'text': answer_text,
+            'username': username,  # Store username with the answer
+            'avatar': avatar,
+            'random_num': random.randint(1, 1000)
+        })
+    except EventRejected as e:
+        return {"success": False, "message": e.message}, e.status
+    return {"success": True}, 200
+
+def record_vote(data):
+    """Records a vote by the session's player; each player votes only once per answer."""
     answer_id = data.get('answer_id')
     avatar = data.get('avatar')
 
     # Validate that required fields are present
     if not answer_id or not avatar:
-        return jsonify({"success": False, "message": "Missing required fields"}), 400
+        return {"success": False, "message": "Missing required fields"}, 400
 
     # Validate username from session
     username = session.get('username')
     if not username:
-        return jsonify({"success": False, "message": "User not authenticated"}), 401
+        return {"success": False, "message": "User not authenticated"}, 401
 
     # Attempt to convert answer_id to an integer
     try:
         answer_id = int(answer_id)
-    except ValueError:
-        return jsonify({"success": False, "message": "Invalid answer ID"}), 400
+    except (TypeError, ValueError):
+        return {"success": False, "message": "Invalid answer ID"}, 400
 
-    # Load the latest game data
-    game_data = load_data()
+    refusal = state.phase_refusal(state.question_of(answer_id), 'voting')
+    if refusal is not None:
+        return {"success": False, "message": refusal}, 409
 
-    # Ensure the game data has the correct structure
-    if 'answers' not in game_data:
-        return jsonify({"success": False, "message": "Invalid game data structure"}), 500
+    # Record the vote; the handler ensures each user votes only once
+    try:
+        commit_event({'type': 'vote_cast', 'answer_id': answer_id,
+                      'username': username, 'avatar': avatar})
+    except EventRejected as e:
+        return {"success": False, "message": e.message}, e.status
 
-    # Find the answer and handle voting
-    for answer in game_data['answers']:
-        if answer.get('id') == answer_id:
-            if 'votes' not in answer:
-                answer['votes'] = []  # Initialize votes if not already present
+    return {"success": True, "message": "Vote recorded successfully"}, 200
 
-            # Ensure each user votes only once
-            if not any(vote['username'] == username for vote in answer['votes']):
-                # Add the username and avatar to the votes list
-                answer['votes'].append(
-                    {"username": username, "avatar": avatar})
-                save_data(game_data)  # Save updated data
-                return jsonify({"success": True, "message": "Vote recorded successfully"}), 200
+@app.route('/submit_answer', methods=['POST'])
+def submit_answer():
+    """Handles the submission of answers along with user information and avatar."""
+    result, status = record_answer(request.get_json(silent=True) or {})
+    return jsonify(result), status
 
-    return jsonify({"success": False, "message": "Failed to vote"}), 400
+@app.route('/vote', methods=['POST'])
+def vote():
+    """Handles voting for an answer, ensuring unique votes by each user."""
+    result, status = record_vote(request.get_json(silent=True) or {})
+    return jsonify(result), status
 
 @app.route('/add_question', methods=['POST'])
 def add_question():
     """Adds a new question."""
-    data = load_data()
     new_question_text = request.json.get('text')
 
     if new_question_text:
-        new_question_id = max(
-            q['id'] for q in data['questions']) + 1 if data['questions'] else 1
-        data['questions'].append(
-            {"id": new_question_id, "text": new_question_text})
-        save_data(data)
+        # The next free question ID is assigned when the event is applied
+        commit_event({'type': 'question_added', 'text': new_question_text})
         return jsonify(success=True)
     return jsonify(success=False)
 
 @app.route('/remove_question', methods=['POST'])
 def remove_question():
     """Removes a question by ID."""
-    data = load_data()
     question_id = request.json.get('id')
-
-    data['questions'] = [q for q in data['questions'] if q['id'] != question_id]
-    save_data(data)
+    commit_event({'type': 'question_removed', 'id': question_id})
 
     return jsonify(success=True)
 
 @app.route('/clear_data', methods=['POST'])
 def clear_data():
     """Resets the game data while preserving user scores."""
-    # Read the current data
-    data = load_data()
-    
-    # Save the current users array
-    current_users = data.get('users', [])
+    questions = state.snapshot('questions')
 
     # Check if there are no questions in the current data
-    if not data.get('questions'):
-        # If no questions, set the initial data with default questions
-        initial_data = {
-            "questions": [
-                {"id": 1, "text": "What is your favorite color?"},
-                {"id": 2, "text": "What is your favorite animal?"}
-            ],
-            "answers": [],
-            "votes": [],
-            "reveal": False,
-            "users": current_users  # Preserve users array
-        }
-        save_data(initial_data)
+    if not questions:
+        # If no questions, start over with the default questions
+        questions = [
+            {"id": 1, "text": "What is your favorite color?"},
+            {"id": 2, "text": "What is your favorite animal?"}
+        ]
     else:
         # If there are existing questions, reorder their IDs
-        reordered_questions = [
+        questions = [
             {"id": i + 1, "text": question['text']}
-            for i, question in enumerate(data['questions'])
+            for i, question in enumerate(questions)
         ]
 
-        # Write the reordered data while preserving users
-        initial_data = {
-            "questions": reordered_questions,
-            "answers": [],
-            "votes": [],
-            "reveal": False,
-            "users": current_users  # Preserve users array
-        }
-        save_data(initial_data)
+    # Drop answers and votes while preserving users
+    commit_event({'type': 'game_reset', 'questions': questions})
 
     # Emit the reset event to the clients
-    socketio.emit('game_reset', {'message': 'Game has been reset while preserving user scores.'})
+    emitter.emit('game_reset', {'message': 'Game has been reset while preserving user scores.'},
+                 to=room_channel())
 
     return jsonify(success=True)
 
 @app.route('/clear_votes', methods=['POST'])
 def clear_votes():
     """Clears all votes from each answer."""
-    data = load_data()
-    for answer in data['answers']:
-        answer['votes'] = []  # Clear votes
-    save_data(data)
+    commit_event({'type': 'votes_cleared'})
     return jsonify(success=True)
 
 @app.route('/set_next_question', methods=['POST'])
 def set_next_question():
-    """Allows admin to set the next question."""
+    """Allows admin to set the next question.
+
+    Timed rounds last ANSWER_SECONDS and VOTING_SECONDS, or the
+    ``answer_seconds`` and ``voting_seconds`` given with the request.
+    """
     question_id = int(request.json['question_id']
                       )  # Convert question_id to integer
+    durations = {'answering': request.json.get('answer_seconds', ANSWER_SECONDS),
+                 'voting': request.json.get('voting_seconds', VOTING_SECONDS)}
+    if any(not isinstance(seconds, (int, float)) or isinstance(seconds, bool) or seconds < 0
+           for seconds in durations.values()):
+        return jsonify(success=False, message="Invalid phase duration"), 400
 
-    # Load data and update the current question
-    data = load_data()
+    # Look up the question and update the current question
     selected_question = next(
-        (q for q in data['questions'] if q['id'] == question_id), None)
+        (q for q in state.snapshot('questions') if q['id'] == question_id), None)
 
     if selected_question:
-        data['current_question'] = selected_question
-        save_data(data)
+        commit_event({'type': 'current_question_set', 'question': selected_question})
 
         # Clear votes for the new question
         clear_votes()  # Call the clear_votes function here
 
+        # Start the clock of a timed round
+        phase = None
+        if any(durations.values()):
+            phase = commit_event({'type': 'phase_started', 'phase': 'answering', 'durations': durations,
+                                  'deadline': time.time() + durations['answering']
+                                  if durations['answering'] else None})
+
         # Emit event to update clients
-        socketio.emit('next_question', {'question': selected_question})
-        return jsonify(success=True, question=selected_question)
+        emitter.emit('next_question', {'question': selected_question, 'phase': phase}, to=room_channel())
+        return jsonify(success=True, question=selected_question, phase=phase)
 
     return jsonify(success=False, message="Question not found"), 404
 
+@app.route('/advance_phase', methods=['POST'])
+@admin_required
+def advance_phase():
+    """Ends the current phase of a timed round now, instead of at its deadline."""
+    phase = state.current_phase()
+    if (phase is None or phase['question_id'] != state.current_question_id()
+            or phase['name'] not in NEXT_PHASE):
+        return jsonify({'success': False, 'message': 'No timed round in progress'}), 409
+    return jsonify({'success': True, 'phase': end_phase(request_room(), state, phase)})
+
 @app.route('/reveal_votes_admin', methods=['POST'])
 def reveal_votes_admin():
-    """Admin endpoint to reveal all votes and calculate points."""
-    data = load_data()
-    data['reveal'] = True
-
-    def update_user_points(username, points):
-        """Update a user's points in the game data."""
-        for user in data['users']:
-            if user['username'] == username:
-                user['score'] += points
-                break
-        save_data(data)
-
-    # Calculate points based on votes
-    for answer in data['answers']:
-        is_correct = answer.get('is_correct', False)
-        answer_username = answer['username']
-
-        # Process votes for this answer
-        for vote in answer.get('votes', []):
-            voter_username = vote['username']
-
-            if is_correct:
-                # Award 1 point to users who voted for the correct answer
-                update_user_points(voter_username, 1)
-            else:
-                # Award 2 points to the answer creator for each vote on their wrong answer
-                update_user_points(answer_username, 2)
-
-    save_data(data)
-    socketio.emit('votes_revealed')
-    return jsonify({'success': True})
+    """Admin endpoint to reveal the current question's votes and award the points.
+
+    Returns the points each player earned this round. Revealing the same
+    question again awards nothing.
+    """
+    points = commit_event({'type': 'votes_revealed'})
+    emitter.emit('votes_revealed', to=room_channel())
+    return jsonify({'success': True, 'points': points})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """This worker's metrics in the Prometheus text format.
+
+    Open to admins, and to scrapers sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    authorization = request.headers.get('Authorization', '')
+    scraper = bool(METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {METRICS_TOKEN}')
+    if not scraper and not session.get('admin_authenticated', False):
+        return jsonify({'success': False, 'message': 'Admin login required'}), 401
+
+    LOADED_ROOMS.set(len(rooms.loaded()))
+    return app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/profiler', methods=['GET', 'POST'])
+@admin_required
+def profiler_toggle():
+    """Starts or stops the sampling profiler of this worker.
+
+    POST ``{"enabled": true, "interval": 0.005, "routes": ["/vote"]}`` starts
+    it (every route if ``routes`` is left out); ``{"enabled": false}`` stops it
+    and writes the collapsed stacks to PROFILE_DIR. GET reports its status.
+    """
+    if request.method == 'GET':
+        return jsonify(dict(profiler.status(), success=True))
+    if ASYNC_MODE != 'threading':
+        return jsonify({'success': False, 'message': 'The profiler needs ASYNC_MODE=threading'}), 409
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('enabled'):
+        result = profiler.stop()
+        if result is None:
+            return jsonify({'success': False, 'message': 'The profiler is not running'}), 409
+        return jsonify(dict(result, success=True))
+
+    interval = data.get('interval', 0.005)
+    routes = data.get('routes')
+    if not isinstance(interval, (int, float)) or not 0.001 <= interval <= 1:
+        return jsonify({'success': False, 'message': 'interval must be between 0.001 and 1 second'}), 400
+    if routes is not None and (not isinstance(routes, list) or not all(isinstance(r, str) for r in routes)):
+        return jsonify({'success': False, 'message': 'routes must be a list of URL rules'}), 400
+    if not profiler.start(interval, routes):
+        return jsonify({'success': False, 'message': 'The profiler is already running'}), 409
+    return jsonify(dict(profiler.status(), success=True))
 
 @app.route('/get_game_data', methods=['GET'])
 def get_game_data():
     try:
-        data = load_data()
-        print(data)  # Log data to verify it's being loaded
-        return jsonify(data), 200
+        def build(data):
+            return data
+
+        return cached_json_response('game_data', build)
     except Exception as e:
         print(f"Error: {str(e)}")  # Log error to check for file issues
         return jsonify({'error': str(e)}), 500
@@ -492,17 +971,197 @@ def get_game_data():
 def update_game_data():
     data = request.json
 
-    # Update the game data on the server (assuming you have a game_data object)
-    game_data = load_data()
-    game_data['users'] = data['users']  # Update the users array
-    game_data['answers'] = data['answers']  # Update the answers array
-    game_data['questions'] = data['questions']  # Update the questions array
-
-    # Save the updated game data (for example, to a file or a database)
-    save_data(game_data)
+    # Replace the users, answers and questions arrays
+    commit_event({
+        'type': 'game_data_updated',
+        'users': data['users'],
+        'answers': data['answers'],
+        'questions': data['questions']
+    })
 
     return jsonify({'success': True})
 
+# Backups: /export streams the game as NDJSON, one record per line, and
+# /import reads the same format back. Neither holds the whole game at once
+EXPORT_CHUNK_SIZE = 64 * 1024  # bytes of records sent at a time
+IMPORT_BATCH_SIZE = 500  # records applied per event
+
+# The fields of each imported record, as field -> (type, default). A missing
+# or null field gets its default; REQUIRED fields must be given, and a field
+# whose default is None may be left out or null
+REQUIRED = object()
+IMPORT_FIELDS = {
+    'user': {'username': (str, REQUIRED), 'avatar': (str, REQUIRED), 'score': (int, 0)},
+    'question': {'id': (int, REQUIRED), 'text': (str, REQUIRED)},
+    'answer': {'id': (int, REQUIRED), 'text': (str, REQUIRED), 'username': (str, REQUIRED),
+               'avatar': (str, REQUIRED), 'votes': (list, list), 'visible': (bool, False),
+               'question_id': (int, None), 'random_num': (int, lambda: random.randint(1, 1000)),
+               'is_correct': (bool, None)},
+    'vote': {'username': (str, REQUIRED), 'avatar': (str, None)},
+    'round': {'question': (dict, REQUIRED), 'answers': (list, REQUIRED), 'points': (dict, dict),
+              'archived_at': ((int, float), None)},
+    'round question': {'id': (int, REQUIRED), 'text': (str, REQUIRED)},
+}
+
+def check_import_record(kind, record):
+    """Checks an imported record and fills in its defaults; returns what is wrong with it, or None.
+
+    The answers and votes inside a record are checked the same way.
+    """
+    for field, (expected, default) in IMPORT_FIELDS[kind].items():
+        value = record.get(field)
+        if value is None:
+            if default is REQUIRED:
+                return f'missing {field}'
+            if default is not None:
+                record[field] = default() if callable(default) else default
+        elif not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            return f'invalid {field}'
+    if kind == 'answer':
+        for vote in record['votes']:
+            if not isinstance(vote, dict):
+                return 'invalid votes'
+            error = check_import_record('vote', vote)
+            if error:
+                return f'{error} of a vote'
+    elif kind == 'round':
+        error = check_import_record('round question', record['question'])
+        if error:
+            return f'{error} of the question'
+        for answer in record['answers']:
+            if not isinstance(answer, dict):
+                return 'invalid answers'
+            error = check_import_record('answer', answer)
+            if error:
+                return f'{error} of an answer'
+        if not all(isinstance(points, int) and not isinstance(points, bool)
+                   for points in record['points'].values()):
+            return 'invalid points'
+    return None
+
+def check_import_game(game):
+    """Checks the game record of an import; returns what is wrong with it, or None."""
+    current = game.get('current_question')
+    if current is not None and (not isinstance(current, dict) or check_import_record('round question', current)):
+        return 'invalid current_question'
+    round_points = game.get('round_points', {})
+    if not isinstance(round_points, dict) or not all(
+            isinstance(points, dict) and all(isinstance(n, int) and not isinstance(n, bool)
+                                             for n in points.values())
+            for points in round_points.values()):
+        return 'invalid round_points'
+    last_answer_id = game.get('last_answer_id')
+    if not isinstance(last_answer_id, (int, type(None))) or isinstance(last_answer_id, bool):
+        return 'invalid last_answer_id'
+    return None
+
+@app.route('/export')
+@admin_required
+def export_game():
+    """Streams the room's game, including its archived rounds, as NDJSON.
+
+    See GameState.export() for the records. gzip-compressed for clients that
+    accept it.
+    """
+    room = room_state()
+    gzipped = bool(request.accept_encodings['gzip'])
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzipped else None
+        chunk = []
+        size = 0
+        for record in room.export():
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            chunk.append(line.encode('utf-8'))
+            size += len(chunk[-1])
+            if size >= EXPORT_CHUNK_SIZE:
+                data = b''.join(chunk)
+                yield compressor.compress(data) if compressor else data
+                chunk = []
+                size = 0
+        data = b''.join(chunk)
+        yield compressor.compress(data) + compressor.flush() if compressor else data
+
+    response = app.response_class(generate(), mimetype='application/x-ndjson')
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.headers['Content-Disposition'] = f'attachment; filename="{request_room()}.ndjson"'
+    return response
+
+def import_error(line_number, message, imported):
+    return jsonify({'success': False, 'message': f'Line {line_number}: {message}',
+                    'imported': imported}), 400
+
+@app.route('/import', methods=['POST'])
+@admin_required
+def import_game():
+    """Replaces the room's game with the NDJSON records of the request body.
+
+    Takes what /export wrote. The body is read a line at a time and every
+    record is checked into a temporary file first, so an invalid record
+    stops the import before the room is touched. The records are then
+    applied in batches; the archived rounds are added to the room's round
+    history.
+    """
+    imported = {'users': 0, 'questions': 0, 'answers': 0, 'rounds': 0}
+    batch = {'users': [], 'questions': [], 'answers': [], 'rounds': []}
+    game = None
+
+    def apply_batch():
+        added = commit_event(dict({'type': 'records_imported'}, **batch))
+        for key in imported:
+            imported[key] += added[key]
+            batch[key] = []
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as checked:
+        count = 0
+        for line_number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return import_error(line_number, 'not valid JSON', imported)
+            if not isinstance(record, dict):
+                return import_error(line_number, 'not a JSON object', imported)
+            kind = record.pop('type', None)
+
+            if kind == 'game' and game is None and not count:
+                # The game record is optional; without it the import starts with no round in progress
+                error = check_import_game(record)
+                if error:
+                    return import_error(line_number, error, imported)
+                game = record
+                continue
+            if kind not in ('user', 'question', 'answer', 'round'):
+                return import_error(line_number, f'unknown record type {kind!r}', imported)
+            error = check_import_record(kind, record)
+            if error:
+                return import_error(line_number, error, imported)
+            checked.write(json.dumps([kind, record], ensure_ascii=False) + '\n')
+            count += 1
+
+        if game is None and not count:
+            return jsonify({'success': False, 'message': 'No records given', 'imported': imported}), 400
+        game = game or {}
+        commit_event({'type': 'game_imported', 'current_question': game.get('current_question'),
+                      'reveal': bool(game.get('reveal', False)),
+                      'round_points': game.get('round_points', {}),
+                      'last_answer_id': game.get('last_answer_id') or 0})
+        checked.seek(0)
+        pending = 0
+        for line in checked:
+            kind, record = json.loads(line)
+            batch[kind + 's'].append(record)
+            pending += 1
+            if pending >= IMPORT_BATCH_SIZE:
+                apply_batch()
+                pending = 0
+        if pending:
+            apply_batch()
+    return jsonify({'success': True, 'imported': imported})
+
 @app.route('/increment_score', methods=['POST'])
 def increment_score():
     """Increments the score of a user."""
@@ -510,22 +1169,14 @@ def increment_score():
     increment_value = request.json.get(
         'increment_value', 1)  # Default increment value is 1
 
-    # Read data from the JSON file
-    data = load_data()
-
     # Find the user and increment their score
-    user = next((user for user in data['users']
-                if user['username'] == username), None)
-    if user:
-        if user.get('score') is None:
-            user['score'] = 0  # Initialize score if it doesn't exist
-        user['score'] += increment_value
-
-        # Write updated data back to the JSON file
-        save_data(data)
-        return jsonify({"success": True, "new_score": user['score']})
+    try:
+        new_score = commit_event({'type': 'score_changed', 'username': username,
+                                  'delta': increment_value})
+    except EventRejected as e:
+        return jsonify({"success": False, "message": e.message}), e.status
 
-    return jsonify({"success": False, "message": "User not found"}), 404
+    return jsonify({"success": True, "new_score": new_score})
 
 @app.route('/decrement_score', methods=['POST'])
 def decrement_score():
@@ -534,50 +1185,116 @@ def decrement_score():
     decrement_value = request.json.get(
         'decrement_value', 1)  # Default decrement value is 1
 
-    # Read data from the JSON file
-    data = load_data()
-
     # Find the user and decrement their score
-    user = next((user for user in data['users']
-                if user['username'] == username), None)
-    if user:
-        if user.get('score') is None:
-            user['score'] = 0  # Initialize score if it doesn't exist
-        user['score'] -= decrement_value
-
-        # Write updated data back to the JSON file
-        save_data(data)
-        return jsonify({"success": True, "new_score": user['score']})
+    try:
+        new_score = commit_event({'type': 'score_changed', 'username': username,
+                                  'delta': -decrement_value})
+    except EventRejected as e:
+        return jsonify({"success": False, "message": e.message}), e.status
 
-    return jsonify({"success": False, "message": "User not found"}), 404
+    return jsonify({"success": True, "new_score": new_score})
 
 @app.route('/delete_user', methods=['POST'])
 def delete_user():
     data = request.get_json()
     username = data.get('username')
 
-    # Load data from the JSON file
-    game_data = load_data()
-
-    # Find the user by username
-    user = next(
-        (user for user in game_data['users'] if user['username'] == username), None)
+    # Remove the user from the list
+    try:
+        commit_event({'type': 'user_deleted', 'username': username})
+    except EventRejected as e:
+        return jsonify({'success': False, 'message': e.message})
 
-    if user is None:
-        return jsonify({'success': False, 'message': 'User not found'})
+    return jsonify({'success': True})
 
-    # Remove the user from the list
-    game_data['users'] = [user for user in game_data['users']
-                          if user['username'] != username]
+@app.route('/rooms', methods=['GET'])
+@admin_required
+def list_rooms():
+    """Lists the rooms saved on disk and those currently loaded."""
+    saved = set()
+    if os.path.isdir(ROOMS_DIR):
+        for name in os.listdir(ROOMS_DIR):
+            room_id = name.split('.', 1)[0]
+            if valid_room_id(room_id):
+                saved.add(room_id)
+    saved.add(DEFAULT_ROOM)
+    return jsonify({'rooms': sorted(saved), 'loaded': sorted(rooms.loaded()),
+                    'current': request_room()})
+
+@app.route('/rooms', methods=['POST'])
+@admin_required
+def create_room():
+    """Creates a new, empty room and switches the admin session to it."""
+    room_id = (request.get_json(silent=True) or {}).get('room')
+    if not valid_room_id(room_id):
+        return jsonify({'success': False,
+                        'message': 'Room IDs are 1-32 letters, digits, - or _'}), 400
+    if rooms.create(room_id) is None:
+        return jsonify({'success': False, 'message': 'Room already exists'}), 409
+    session['room'] = room_id
+    return jsonify({'success': True, 'room': room_id})
+
+# Bulk operations: the event each operation turns into, and the fields it needs
+BULK_OPERATIONS = {
+    'change_score': lambda op: {'type': 'score_changed', 'username': op['username'],
+                                'delta': op['increment']},
+    'delete_user': lambda op: {'type': 'user_deleted', 'username': op['username']},
+    'add_question': lambda op: {'type': 'question_added', 'text': op['text']},
+    'remove_question': lambda op: {'type': 'question_removed', 'id': op['id']},
+}
+
+BULK_FIELD_TYPES = {
+    'username': str,
+    'increment': int,
+    'text': str,
+    'id': int,
+}
+
+@app.route('/bulk_operations', methods=['POST'])
+@admin_required
+def bulk_operations():
+    """Applies a list of admin operations as one transaction.
+
+    Expects ``{"operations": [{"op": "add_question", "text": "..."},
+    {"op": "change_score", "username": "...", "increment": 5}, ...]}``;
+    ops are change_score, delete_user, add_question and remove_question.
+    Either all operations are applied, with one write and one broadcast,
+    or none is.
+    """
+    operations = (request.get_json(silent=True) or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'No operations given'}), 400
+
+    events = []
+    for index, op in enumerate(operations):
+        build = BULK_OPERATIONS.get(op.get('op')) if isinstance(op, dict) else None
+        if build is None:
+            return jsonify({'success': False,
+                            'message': f'Operation {index}: unknown operation'}), 400
+        try:
+            event = build(op)
+        except KeyError as e:
+            return jsonify({'success': False,
+                            'message': f'Operation {index}: missing {e.args[0]}'}), 400
+        for field, expected in BULK_FIELD_TYPES.items():
+            value = op.get(field)
+            if field in op and (not isinstance(value, expected) or isinstance(value, bool)
+                                or value == ''):
+                return jsonify({'success': False,
+                                'message': f'Operation {index}: invalid {field}'}), 400
+        events.append(event)
 
-    # Save the updated data back to the JSON file
-    save_data(game_data)
+    try:
+        state.commit_many(events)
+    except EventRejected as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
 
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'applied': len(events)})
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory('static/fav', 'favicon.ico', mimetype='image/vnd.microsoft.icon')
+    return send_from_directory('static/fav', 'favicon.ico', mimetype='image/vnd.microsoft.icon',
+                               max_age=STATIC_MAX_AGE)
 
 @app.route('/robots.txt')
 def robots():
@@ -609,14 +1326,95 @@ def sitemap():
     )
     return response
 
+# Open Socket.IO connections of this worker, checked against MAX_CONNECTIONS
+connection_count = 0
+connection_lock = threading.Lock()
+
 @socketio.on('connect')
 def handle_connect():
+    global connection_count
+    wait = admit('connect')
+    if wait:
+        # E.g. a reconnect loop; wire.js tries again after retry_after
+        raise ConnectionRefusedError('Too many connection attempts', {'retry_after': round(wait, 2)})
+    with connection_lock:
+        if MAX_CONNECTIONS and connection_count >= MAX_CONNECTIONS:
+            REFUSED_CONNECTIONS.inc()
+            raise ConnectionRefusedError('Server is full')
+        connection_count += 1
+        SOCKET_CONNECTIONS.set(connection_count)
     print("Client connected")
+    # Only the events of the session's room reach this socket
+    join_room(socket_channel(room_channel()))
+
+@socketio.on('watch_question')
+def handle_watch_question(data):
+    """Also delivers changes about an earlier question, e.g. while reviewing it."""
+    previous = session.get('watched_question')
+    if previous is not None:
+        leave_room(socket_channel(f'{room_channel()}:question:{previous}'))
+    question_id = (data or {}).get('question_id')
+    session['watched_question'] = question_id
+    if question_id is not None:
+        join_room(socket_channel(f'{room_channel()}:question:{question_id}'))
+
+SOCKET_EVENT_SECONDS = metrics.histogram('quiz_socketio_event_duration_seconds',
+                                         'Time to handle a Socket.IO event', ['event'])
+
+def socket_action(event, action, data):
+    """Runs record_answer/record_vote for a socket event; the result is the ack."""
+    with SOCKET_EVENT_SECONDS.labels(event).time():
+        wait = admit(event)
+        if wait:
+            return {'success': False, 'message': 'Too many requests', 'retry_after': round(wait, 2)}
+        if not session.get('authenticated'):
+            return {'success': False, 'message': 'Login required'}
+        if not isinstance(data, dict):
+            return {'success': False, 'message': 'Invalid data'}
+        try:
+            result, status = action(data)
+        except EventRejected as e:
+            result = {'success': False, 'message': e.message}
+        return result
+
+@socketio.on('submit_answer')
+def handle_submit_answer(data):
+    """Same as POST /submit_answer, over the connection's session."""
+    return socket_action('submit_answer', record_answer, data)
+
+@socketio.on('vote')
+def handle_vote(data):
+    """Same as POST /vote, over the connection's session."""
+    return socket_action('vote', record_vote, data)
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    global connection_count
+    with connection_lock:
+        connection_count -= 1
+        SOCKET_CONNECTIONS.set(connection_count)
     print("Client disconnected")
 
+@app.errorhandler(EventRejected)
+def handle_event_rejected(e):
+    # E.g. a room that could not be fetched from the primary worker
+    return jsonify({'success': False, 'message': e.message}), e.status
+
+@app.after_request
+def compress_json_response(response):
+    """Compresses JSON bodies for clients that accept it (cached responses come compressed already)."""
+    if (response.mimetype not in ('application/json', COMPACT_MEDIA_TYPE)
+            or response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = accepted_encoding() if len(body) >= COMPRESS_MIN_SIZE else None
+    if encoding is not None:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.after_request
 def add_security_headers(response):
     """Add security headers to each response"""
@@ -629,4 +1427,8 @@ def add_security_headers(response):
     return response
 
 if __name__ == '__main__':
-    socketio.run(app, debug=False)
+    # systemd and docker stop send SIGTERM, which would end the process without
+    # running the atexit hooks that write out pending changes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # In 'threading' mode this is Werkzeug's development server
+    socketio.run(app, port=PORT, debug=False, allow_unsafe_werkzeug=ASYNC_MODE == 'threading')
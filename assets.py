@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import logging
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:  # .gz copies only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# File types worth compressing; images and fonts are compressed already
+COMPRESSIBLE = {'.js', '.css', '.svg', '.json', '.webmanifest', '.txt', '.ico', '.html'}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+class AssetManifest:
+    """Fingerprinted, precompressed copies of the static files.
+
+    ``build()`` copies every file under ``static_dir`` into ``build_dir`` as
+    ``<name>.<content hash><ext>``, next to ``.gz`` (and, with the brotli
+    package, ``.br``) versions of the text files. A changed file gets a new
+    name, so the copies can be cached by browsers forever. Stylesheets are
+    rewritten to point at the fingerprinted names of the files they use.
+    Several workers may build into the same directory at once.
+    """
+
+    def __init__(self, static_dir, build_dir, url_path='/static'):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.url_path = url_path
+        self._hashed = {}
+        self._files = set()
+
+    def build(self):
+        hashed = {}
+        names = []
+        for root, dirs, files in os.walk(self.static_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if not file.startswith('.'):
+                    names.append(os.path.relpath(os.path.join(root, file), self.static_dir).replace(os.sep, '/'))
+
+        # Stylesheets last, so the files they point at already have their names
+        for name in sorted(names, key=lambda name: (name.endswith('.css'), name)):
+            with open(os.path.join(self.static_dir, name), 'rb') as f:
+                content = f.read()
+            if name.endswith('.css'):
+                content = self._rewrite_css(name, content, hashed)
+            base, ext = posixpath.splitext(name)
+            hashed_name = f'{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+            self._write(hashed_name, content)
+            if ext in COMPRESSIBLE:
+                self._write(hashed_name + '.gz', content, lambda data: gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    self._write(hashed_name + '.br', content, lambda data: brotli.compress(data, quality=11))
+            hashed[name] = hashed_name
+
+        self._hashed = hashed
+        self._files = set(hashed.values())
+        logger.info(f"Built {len(hashed)} static files into {self.build_dir}")
+
+    def _rewrite_css(self, name, content, hashed):
+        directory = posixpath.dirname(f'{self.url_path}/{name}')
+
+        def replace(match):
+            target = posixpath.normpath(posixpath.join(directory, match.group(2)))
+            relative = target[len(self.url_path) + 1:] if target.startswith(self.url_path + '/') else None
+            if relative not in hashed:
+                return match.group(0)
+            return f"url('{self.url_path}/{hashed[relative]}')"
+
+        return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+    def _write(self, name, content, encode=None):
+        path = os.path.join(self.build_dir, name)
+        if os.path.exists(path):
+            # Same name, same content
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode(content) if encode else content)
+        os.replace(tmp_path, path)
+
+    def hashed_name(self, name):
+        """The fingerprinted name of a static file, or ``name`` itself if it has none."""
+        return self._hashed.get(name.lstrip('/'), name)
+
+    def is_hashed(self, name):
+        return name in self._files
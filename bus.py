@@ -0,0 +1,179 @@
+import json
+import logging
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from socketio import PubSubManager
+
+logger = logging.getLogger(__name__)
+
+# Messages between the workers. A bus delivers every message published on a
+# channel to the subscribers of that channel in the *other* workers, in the
+# order they were published. Messages must be JSON-serializable.
+
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+class LocalBus:
+    """Bus of a single worker: there are no other workers to deliver to."""
+
+    def publish(self, channel, message):
+        pass
+
+    def subscribe(self, channel, callback):
+        pass
+
+    def close(self):
+        pass
+
+
+class BusHub(socketserver.ThreadingTCPServer):
+    """Relays messages between the workers over local TCP connections.
+
+    Runs inside the primary worker. Every worker, the primary included,
+    connects to it with a SocketBus. Frames are JSON lines:
+    ``{"op": "sub", "channel": ...}`` and
+    ``{"op": "pub", "channel": ..., "message": ...}``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(parse_address(address), _HubConnection)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='bus-hub', daemon=True).start()
+
+    def subscribe(self, connection, channel):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(connection)
+
+    def deliver(self, sender, channel, line):
+        with self._lock:
+            connections = [c for c in self._subscribers.get(channel, ()) if c is not sender]
+        for connection in connections:
+            connection.send(line)
+
+    def drop(self, connection):
+        with self._lock:
+            for connections in self._subscribers.values():
+                connections.discard(connection)
+
+
+class _HubConnection(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self._send_lock = threading.Lock()
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                try:
+                    frame = json.loads(line)
+                except ValueError:
+                    logger.warning("Dropping malformed bus frame")
+                    continue
+                if frame.get('op') == 'sub':
+                    self.server.subscribe(self, frame['channel'])
+                elif frame.get('op') == 'pub':
+                    self.server.deliver(self, frame['channel'], line)
+        except OSError:
+            pass
+        finally:
+            self.server.drop(self)
+
+    def send(self, line):
+        try:
+            with self._send_lock:
+                self.wfile.write(line)
+                self.wfile.flush()
+        except OSError as e:
+            logger.warning(f"Bus connection lost: {str(e)}")
+            self.server.drop(self)
+
+
+class SocketBus:
+    """Bus endpoint of one worker, connected to the BusHub at ``address``."""
+
+    def __init__(self, address, connect_timeout=30.0):
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self._socket = socket.create_connection(parse_address(address))
+                break
+            except OSError:
+                # The primary worker may still be starting up
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+        self._send_lock = threading.Lock()
+        self._callbacks = {}
+        threading.Thread(target=self._read_loop, name='bus-reader', daemon=True).start()
+
+    def publish(self, channel, message):
+        self._send({'op': 'pub', 'channel': channel, 'message': message})
+
+    def subscribe(self, channel, callback):
+        first = channel not in self._callbacks
+        self._callbacks.setdefault(channel, []).append(callback)
+        if first:
+            self._send({'op': 'sub', 'channel': channel})
+
+    def _send(self, frame):
+        line = (json.dumps(frame, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._send_lock:
+            self._socket.sendall(line)
+
+    def _read_loop(self):
+        try:
+            for line in self._reader:
+                frame = json.loads(line)
+                for callback in self._callbacks.get(frame['channel'], ()):
+                    try:
+                        callback(frame['message'])
+                    except Exception as e:
+                        logger.error(f"Error handling bus message: {str(e)}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Bus connection failed: {str(e)}")
+        logger.error("Disconnected from the bus; this worker no longer receives updates")
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+
+class BusManager(PubSubManager):
+    """Socket.IO client manager that passes emits on to the other workers.
+
+    Each worker delivers them to its own connected clients, so
+    ``socketio.emit(...)`` on any worker reaches every client.
+    """
+
+    name = 'bus'
+
+    def __init__(self, bus, channel='socketio'):
+        super().__init__(channel=channel)
+        self.bus = bus
+        self._messages = queue.Queue()
+        bus.subscribe(channel, self._messages.put)
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self._messages.get()
@@ -0,0 +1,174 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from game_state import EventRejected
+
+logger = logging.getLogger(__name__)
+
+# Multi-worker mode. The primary worker (WORKER_ID 0) owns the game state:
+# it applies and persists every event, exactly as in single-worker mode, and
+# publishes each committed batch on the bus. The other workers keep replicas
+# of the rooms they serve, answer reads from them, and forward their writes
+# to the primary.
+#
+# Bus channels:
+#   'commit'          {'id', 'reply_to', 'room', 'events'} -> primary
+#   'sync'            {'id', 'reply_to', 'room'}           -> primary
+#   'state'           {'room', 'events'}                   -> replicas
+#   'reply:<worker>'  {'id', 'results', 'version'} or {'id', 'error', 'status'}
+
+
+class ReplicaStorage:
+    """Storage of a replica: starts from the primary's copy and writes nothing."""
+
+    snapshots = False
+
+    def __init__(self, data):
+        self._data = data
+
+    def load(self):
+        return self._data, []
+
+    def append(self, events, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class Primary:
+    """Serves the replicas from the primary worker."""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.rooms = None
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='bus-request')
+
+    def serve(self, rooms):
+        self.rooms = rooms
+        self.bus.subscribe('commit', lambda message: self._pool.submit(self._commit, message))
+        self.bus.subscribe('sync', lambda message: self._pool.submit(self._sync, message))
+
+    def follow(self, room_id, state):
+        """Publishes the committed batches of a room for the replicas."""
+        state.add_event_listener(
+            lambda events: self.bus.publish('state', {'room': room_id, 'events': events}))
+
+    def _reply(self, message, reply):
+        self.bus.publish(f"reply:{message['reply_to']}", dict(reply, id=message['id']))
+
+    def _commit(self, message):
+        state = self.rooms.get(message['room'])
+        if state is None:
+            self._reply(message, {'error': 'Room not found', 'status': 404})
+            return
+        try:
+            results = state.commit_many(message['events'])
+        except EventRejected as e:
+            self._reply(message, {'error': e.message, 'status': e.status})
+            return
+        self._reply(message, {'results': results, 'version': state.version})
+
+    def _sync(self, message):
+        # Replicas also ask for rooms that are being created
+        state = self.rooms.open(message['room'])
+        if state is None:
+            self._reply(message, {'error': 'Room not found', 'status': 404})
+            return
+        with state.lock:
+            self._reply(message, {'data': state.data})
+
+
+class Replica:
+    """Keeps the replicas of one non-primary worker in step with the primary."""
+
+    def __init__(self, bus, worker_id, timeout=10.0):
+        self.bus = bus
+        self.worker_id = worker_id
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._waiting = {}
+        self._states = {}
+        # Batches that arrive while a room's copy is being fetched
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='bus-resync')
+        bus.subscribe(f'reply:{worker_id}', self._on_reply)
+        bus.subscribe('state', self._on_state)
+
+    def open_room(self, room_id, build_state):
+        """Fetches a room from the primary and returns ``build_state(storage, forward)``."""
+        with self._lock:
+            self._buffers[room_id] = []
+        reply = self._request('sync', {'room': room_id}, attempts=6)
+        if 'error' in reply:
+            with self._lock:
+                self._buffers.pop(room_id, None)
+            raise EventRejected(reply['error'], reply['status'])
+        state = build_state(ReplicaStorage(reply['data']),
+                            lambda events: self._forward(room_id, events))
+        with self._lock:
+            self._states[room_id] = state
+            for events in self._buffers.pop(room_id):
+                self._follow(room_id, state, events)
+        return state
+
+    def _forward(self, room_id, events):
+        reply = self._request('commit', {'room': room_id, 'events': events})
+        if 'error' in reply:
+            raise EventRejected(reply['error'], reply['status'])
+        # Read-your-writes: the batch is on its way over the 'state' channel
+        if not self._states[room_id].wait_for(reply['version'], self.timeout):
+            logger.warning(f"Replica of room {room_id} is lagging behind the primary")
+        return reply['results']
+
+    def _request(self, channel, message, attempts=1):
+        for attempt in range(attempts):
+            request_id = next(self._ids)
+            future = Future()
+            self._waiting[request_id] = future
+            self.bus.publish(channel, dict(message, id=request_id, reply_to=self.worker_id))
+            try:
+                return future.result(self.timeout)
+            except TimeoutError:
+                logger.warning(f"No answer from the primary worker on '{channel}'")
+            finally:
+                self._waiting.pop(request_id, None)
+        raise EventRejected('The primary worker is not reachable', 503)
+
+    def _on_reply(self, message):
+        future = self._waiting.get(message['id'])
+        if future is not None:
+            future.set_result(message)
+
+    def _on_state(self, message):
+        room_id = message['room']
+        with self._lock:
+            if room_id in self._buffers:
+                self._buffers[room_id].append(message['events'])
+            elif room_id in self._states:
+                self._follow(room_id, self._states[room_id], message['events'])
+
+    def _follow(self, room_id, state, events):
+        # Called with self._lock held, in bus order
+        if state.apply_remote(events):
+            return
+        logger.warning(f"Replica of room {room_id} missed events; fetching a fresh copy")
+        self._buffers[room_id] = [events]
+        self._pool.submit(self._resync, room_id, state)
+
+    def _resync(self, room_id, state):
+        try:
+            reply = self._request('sync', {'room': room_id}, attempts=6)
+        except EventRejected:
+            reply = {'error': True}
+        with self._lock:
+            buffered = self._buffers.pop(room_id, [])
+            if 'error' in reply:
+                logger.error(f"Could not resync room {room_id}")
+                return
+            state.reset(reply['data'])
+            for events in buffered:
+                self._follow(room_id, state, events)
@@ -0,0 +1,142 @@
+import threading
+
+import metrics
+from wire import compact, compact_channel
+
+FLUSH_SECONDS = metrics.histogram('quiz_emit_flush_seconds',
+                                  'Time to send one window of batched emits to every room')
+EMITS = metrics.counter('quiz_emits_total', 'Socket.IO events sent, per event name', ['event'])
+
+# Changes that only matter in their latest form, keyed by what they are about.
+# Within one window an earlier change with the same key is dropped.
+SUPERSEDING_CHANGES = {
+    'visibility_changed': lambda change: change['answer_id'],
+    'correct_changed': lambda change: change['answer_id'],
+    'score_changed': lambda change: change['username'],
+    'question_changed': lambda change: None,
+    'votes_revealed': lambda change: None,
+}
+
+
+def supersede_key(change):
+    key = SUPERSEDING_CHANGES.get(change['type'])
+    return None if key is None else (change['type'], key(change))
+
+
+class _Pending:
+    """What is waiting to go out to one Socket.IO room."""
+
+    def __init__(self):
+        self.delta = None
+        self.changes = []
+        self.keys = {}
+        self.events = {}
+
+    def add_changes(self, changes):
+        for change in changes:
+            key = supersede_key(change)
+            if key is not None:
+                if key in self.keys:
+                    self.changes[self.keys[key]] = None
+                self.keys[key] = len(self.changes)
+            self.changes.append(change)
+
+    def merged_changes(self):
+        return [change for change in self.changes if change is not None]
+
+
+class CoalescingEmitter:
+    """Collects Socket.IO emissions for ``window`` seconds and sends them together.
+
+    State deltas for a room are merged into one 'state_delta' (or
+    'question_delta') covering the whole window. Changes that were superseded
+    within it, such as an answer toggled visible and hidden again, are left
+    out. Other events emitted with the same ``key`` replace each other, so
+    only the latest goes out. However fast the admin clicks, every room gets
+    at most one batch per window. A window of 0 sends everything right away.
+
+    Each batch is also sent, encoded once, to the compact variant of the room
+    (see wire.py).
+    """
+
+    def __init__(self, socketio, window=0.05):
+        self.socketio = socketio
+        self.window = window
+        self._pending = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+        # Held from taking the pending batches until they are sent, so two
+        # flushes (or, with a window of 0, two writers) cannot reorder deltas
+        self._send_lock = threading.Lock()
+
+    def emit_delta(self, to, from_version, version, changes):
+        """Queues a 'state_delta' for the range ``from_version``..``version``."""
+        with self._lock:
+            pending = self._pending.setdefault(to, _Pending())
+            if pending.delta is None:
+                pending.delta = {'from': from_version}
+            pending.delta['version'] = version
+            pending.add_changes(changes)
+        self._schedule()
+
+    def emit_question_delta(self, to, question_id, changes):
+        with self._lock:
+            pending = self._pending.setdefault(to, _Pending())
+            if pending.delta is None:
+                pending.delta = {'question_id': question_id}
+            pending.add_changes(changes)
+        self._schedule()
+
+    def emit(self, event, data=None, to=None, key=None):
+        """Queues an event; ``data`` may be a callable, called once when the batch goes out."""
+        with self._lock:
+            pending = self._pending.setdefault(to, _Pending())
+            # The replacement goes out after everything queued before it
+            pending.events.pop((event, key), None)
+            pending.events[(event, key)] = data
+        self._schedule()
+
+    def _schedule(self):
+        if self.window <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        """Sends everything queued so far."""
+        with self._send_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._scheduled = False
+            if pending:
+                with FLUSH_SECONDS.time():
+                    self._send_all(pending)
+
+    def _send_all(self, pending):
+        for to, batch in pending.items():
+            if batch.delta is not None:
+                delta = dict(batch.delta, changes=batch.merged_changes())
+                event = 'question_delta' if 'question_id' in delta else 'state_delta'
+                self._send(event, delta, to)
+            for (event, key), data in batch.events.items():
+                self._send(event, data() if callable(data) else data, to)
+
+    def _send(self, event, data, to):
+        EMITS.labels(event).inc()
+        self._emit(event, data, to)
+        if to is not None:
+            self._emit(event, compact(data), compact_channel(to))
+
+    def _emit(self, event, data, to):
+        if data is None:
+            self.socketio.emit(event, to=to)
+        else:
+            self.socketio.emit(event, data, to=to)
@@ -0,0 +1,869 @@
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import metrics
+from leaderboard import Leaderboard
+
+logger = logging.getLogger(__name__)
+
+LOCK_WAIT = metrics.histogram('quiz_state_lock_wait_seconds',
+                              'Time spent waiting for a busy game state lock',
+                              buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+STORAGE_SECONDS = metrics.histogram('quiz_storage_seconds',
+                                    'Duration of storage operations', ['operation'])
+
+
+# A timed round goes through these phases. Answers are only accepted while
+# answering and votes while voting; the reveal scores the round
+PHASES = ('answering', 'voting', 'reveal')
+PHASE_REFUSALS = {'answering': 'Answers are closed', 'voting': 'Voting is not open'}
+# Answers are only taken for the current question
+QUESTION_CLOSED = 'That question is closed'
+
+
+class EventRejected(Exception):
+    """Raised by an event handler when the event cannot be applied."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def round_points(answers):
+    """Points earned in one round, as ``{username: points}``, in one pass over the votes.
+
+    Voters for a correct answer earn 1 point; the author of a wrong answer
+    earns 2 points for every vote it fooled.
+    """
+    points = {}
+    for answer in answers:
+        votes = answer.get('votes', [])
+        if answer.get('is_correct', False):
+            for vote in votes:
+                points[vote['username']] = points.get(vote['username'], 0) + 1
+        elif votes:
+            points[answer['username']] = points.get(answer['username'], 0) + 2 * len(votes)
+    return points
+
+
+class _Command:
+    """Events queued for the writer thread, plus the slot for their outcome."""
+
+    def __init__(self, events):
+        self.events = events
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class GameState:
+    """Process-resident copy of the game data.
+
+    Reads are served straight from memory while holding ``lock``. Every
+    change is described by an event (a small dict with a ``type``) passed to
+    ``commit()``. Events are applied by a single writer thread, one at a
+    time, so read-modify-write races and duplicate IDs cannot happen; events
+    that arrive together are handed to the storage backend as one batch. A
+    background thread snapshots the document at most once every
+    ``flush_interval`` seconds, and once more on shutdown.
+
+    Each applied event is also turned into a small client-facing change
+    (``answer_added``, ``vote_added``, ...) stamped with the new version.
+    The last ``history`` changes are kept for clients catching up, and
+    listeners registered with ``add_listener()`` receive them as they happen.
+
+    In a multi-worker setup only the primary worker applies and persists
+    events. The other workers hold replicas: they pass ``forward``, a
+    callable that sends events to the primary and returns their results,
+    and follow the primary through ``apply_remote()``.
+
+    Storage calls go through ``run_blocking(fn, *args)`` if given, so that
+    an event loop (eventlet, gevent) can hand the disk access to a real
+    thread instead of stalling every connection.
+
+    Only the current round is kept in memory. When the current question
+    changes, the answers to every other question move to ``archive`` (a
+    storage.RoundArchive), one record per question, and ``history()`` pages
+    through them.
+    """
+
+    def __init__(self, storage, flush_interval=1.0, max_batch=256, history=1000, forward=None,
+                 run_blocking=None, archive=None):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.lock = metrics.TimedLock(threading.RLock(), LOCK_WAIT)
+        self._dirty = False
+        # Set when a backend without snapshots failed to save a batch; the
+        # next flush then rewrites the whole state
+        self._resync = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._queue = queue.Queue()
+        self._writer = None
+        self._changes = deque(maxlen=history)
+        self._listeners = []
+        self._event_listeners = []
+        self._forward = forward
+        self._applied = threading.Condition(self.lock)
+        self._run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+        self.archive = archive
+        self._ended_rounds = []  # archive records of the events being applied
+
+        with STORAGE_SECONDS.labels('load').time():
+            self.data, events = self._run_blocking(storage.load)
+        self.data.setdefault('version', 0)
+        self._reindex()
+        for event in events:
+            # Events already contained in the snapshot are skipped
+            if event.get('seq', 0) <= self.data['version']:
+                continue
+            try:
+                self._apply(event)
+            except EventRejected as e:
+                logger.warning(f"Skipping logged event {event.get('seq')}: {e.message}")
+            self.data['version'] = event['seq']
+            self._dirty = True
+        if archive is not None and forward is None:
+            # Rounds archived by events that were never saved are live again
+            self._run_blocking(archive.discard_after, self.data['version'])
+            self._archive_ended_rounds()
+
+    @property
+    def version(self):
+        return self.data['version']
+
+    def snapshot(self, key):
+        """Returns a private copy of one top-level field, safe to use without the lock."""
+        with self.lock:
+            return copy.deepcopy(self.data.get(key))
+
+    def add_listener(self, listener):
+        """Registers ``listener(from_version, changes)``, called after every committed batch."""
+        self._listeners.append(listener)
+
+    def add_event_listener(self, listener):
+        """Registers ``listener(events)``, called with the events of every committed batch, in order."""
+        self._event_listeners.append(listener)
+
+    def current_question_id(self):
+        return (self.data.get('current_question') or {}).get('id')
+
+    def leaderboard(self, offset=0, limit=10, username=None):
+        """Returns ``(rows, total, me)``: a page of the score ranking, the number
+        of ranked players, and the row of ``username`` (None if not given or unknown).
+
+        Each row is a copy of the user record plus its ``rank``.
+        """
+        with self.lock:
+            rows = [dict(self._users[name], rank=rank)
+                    for rank, name, score in self._leaderboard.page(offset, limit)]
+            rank = self._leaderboard.rank(username) if username is not None else None
+            me = dict(self._users[username], rank=rank) if rank is not None else None
+            return rows, len(self._leaderboard), me
+
+    def history(self, offset=0, limit=10):
+        """Returns ``(rounds, total)``: a page of the archived rounds, newest first."""
+        if self.archive is None:
+            return [], 0
+        return self._run_blocking(self.archive.page, offset, limit)
+
+    def export(self, chunk_size=256):
+        """Yields the whole game as records, for a backup.
+
+        First a ``game`` record with the round in progress, then one record
+        per user, question and answer, then the archived rounds. Records are
+        copied a chunk at a time, so the lock is only held briefly and the
+        game is never copied as a whole.
+        """
+        with self.lock:
+            game = {
+                'type': 'game',
+                'version': self.data['version'],
+                'current_question': copy.deepcopy(self.data.get('current_question')),
+                'reveal': self.data.get('reveal', False),
+                'round_points': copy.deepcopy(self.data.get('round_points', {})),
+                'last_answer_id': self.data['last_answer_id']
+            }
+            lists = [(kind, list(self.data[key])) for kind, key in
+                     (('user', 'users'), ('question', 'questions'), ('answer', 'answers'))]
+        yield game
+        for kind, items in lists:
+            for start in range(0, len(items), chunk_size):
+                with self.lock:
+                    chunk = copy.deepcopy(items[start:start + chunk_size])
+                for item in chunk:
+                    yield dict({'type': kind}, **item)
+        if self.archive is not None:
+            for record in self.archive.records():
+                yield dict({'type': 'round'}, **record)
+
+    def phase_refusal(self, question_id, name):
+        """Why an answer (``name`` 'answering') or a vote ('voting') about a
+        question would be refused right now, or None.
+
+        A cheap check to make before queuing the event. Past the deadline
+        counts as closed, even before the scheduler has moved the phase on.
+        """
+        with self.lock:
+            phase = self.data.get('phase')
+            if phase is None or phase['question_id'] != question_id:
+                return None
+            if phase['name'] == name and (phase['deadline'] is None or time.time() < phase['deadline']):
+                return None
+        return PHASE_REFUSALS[name]
+
+    def current_phase(self):
+        """A copy of the phase of the current timed round, or None."""
+        with self.lock:
+            phase = self.data.get('phase')
+            return copy.deepcopy(phase) if phase is not None else None
+
+    def question_of(self, answer_id):
+        """The question an answer was given to, or None."""
+        answer = self._answers.get(answer_id)
+        return answer.get('question_id') if answer is not None else None
+
+    def answers_for(self, question_id):
+        """Returns the answers given to one question, in submission order."""
+        return self._answers_by_question.get(question_id, [])
+
+    def changes_since(self, version, question_id=None):
+        """Returns ``(changes, up_to_version)`` for the changes after ``version``.
+
+        With a ``question_id``, changes scoped to other questions are left
+        out. Returns None if the changes are no longer in the history.
+        """
+        with self.lock:
+            current = self.data['version']
+            if version == current:
+                return [], current
+            if (version > current or not self._changes
+                    or version < self._changes[0]['version'] - 1):
+                return None
+            changes = [change for change in self._changes if change['version'] > version
+                       and (question_id is None
+                            or change.get('question_id', question_id) == question_id)]
+            return changes, current
+
+    def commit(self, event):
+        """Applies an event, records it and returns the handler's result.
+
+        Raises EventRejected if the handler refused the event.
+        """
+        if self._forward is not None:
+            return self._forward([event])[0]
+        command = _Command([event])
+        if self._writer is None:
+            # Not started (scripts, startup); apply on the calling thread
+            self._process([command])
+        else:
+            self._queue.put(command)
+            command.done.wait()
+        if command.error is not None:
+            raise command.error
+        return command.results[0]
+
+    def commit_many(self, events):
+        """Applies several events as one unit and returns their results.
+
+        Either every event is applied, persisted in one storage write and
+        broadcast as one batch, or none is: if a handler raises
+        EventRejected, the events before it are rolled back.
+        """
+        if self._forward is not None:
+            return self._forward(list(events))
+        command = _Command(list(events))
+        if self._writer is None:
+            self._process([command])
+        else:
+            self._queue.put(command)
+            command.done.wait()
+        if command.error is not None:
+            raise command.error
+        return command.results
+
+    def _process(self, commands):
+        """Applies a batch of commands and persists the accepted events in one go."""
+        applied = []
+        changes = []
+        try:
+            with self.lock:
+                from_version = self.data['version']
+                for command in commands:
+                    mark = len(applied)
+                    # Single events are checked before they change anything;
+                    # a group needs a copy to go back to
+                    backup = copy.deepcopy(self.data) if len(command.events) > 1 else None
+                    try:
+                        command.results = [self._commit_one(event, applied, changes)
+                                           for event in command.events]
+                    except Exception as e:
+                        # A failing handler only fails its own command: the
+                        # caller gets the error and the writer carries on
+                        if not isinstance(e, EventRejected):
+                            logger.exception("Error applying event")
+                        command.error = e
+                        if backup is not None:
+                            self._rollback(backup, applied, changes, mark)
+                if applied:
+                    # Archived before the state that no longer has them is saved
+                    self._archive_ended_rounds()
+                    if not self._resync:
+                        try:
+                            with STORAGE_SECONDS.labels('append').time():
+                                self._run_blocking(self.storage.append, applied, self.data)
+                        except Exception as e:
+                            # The change is live in memory; the next snapshot (or,
+                            # without snapshots, a full rewrite) still saves it
+                            logger.error(f"Error saving data: {str(e)}")
+                            self._resync = not self.storage.snapshots
+                    self._dirty = True
+        finally:
+            for command in commands:
+                command.done.set()
+        if applied:
+            self._notify(from_version, applied, changes)
+
+    def _archive_ended_rounds(self):
+        records, self._ended_rounds = self._ended_rounds, []
+        if not records or self.archive is None or self._forward is not None:
+            # Replicas leave the archive to the primary
+            return
+        try:
+            with STORAGE_SECONDS.labels('archive').time():
+                self._run_blocking(self.archive.append, records)
+        except Exception as e:
+            logger.error(f"Error archiving rounds: {str(e)}")
+
+    def _notify(self, from_version, events, changes):
+        for listener in self._event_listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                logger.error(f"Error notifying listener: {str(e)}")
+        for listener in self._listeners:
+            try:
+                listener(from_version, changes)
+            except Exception as e:
+                logger.error(f"Error notifying listener: {str(e)}")
+
+    def _commit_one(self, event, applied, changes):
+        result = self._apply(event)
+        event['seq'] = self.data['version'] + 1
+        self._record(event, applied, changes)
+        return result
+
+    def _record(self, event, applied, changes):
+        self.data['version'] = event['seq']
+        applied.append(event)
+        change = self._describe(event)
+        change['version'] = event['seq']
+        self._changes.append(change)
+        changes.append(change)
+
+    def apply_remote(self, events):
+        """Applies events already committed by the primary worker (replicas only).
+
+        Events this replica already has are skipped. Returns False, applying
+        nothing more, if an event is missing before the given ones; the
+        replica must then be reset from a fresh copy of the data.
+        """
+        applied = []
+        changes = []
+        with self.lock:
+            from_version = self.data['version']
+            for event in events:
+                if event['seq'] <= self.data['version']:
+                    continue
+                if event['seq'] != self.data['version'] + 1:
+                    return False
+                try:
+                    self._apply(event)
+                except EventRejected as e:
+                    logger.warning(f"Skipping replicated event {event['seq']}: {e.message}")
+                self._record(event, applied, changes)
+            self._applied.notify_all()
+            self._ended_rounds.clear()
+        if applied:
+            self._notify(from_version, applied, changes)
+        return True
+
+    def reset(self, data):
+        """Replaces the whole state with a fresh copy from the primary worker (replicas only)."""
+        with self.lock:
+            self.data = data
+            self.data.setdefault('version', 0)
+            self._reindex()
+            # Clients catching up must reload everything
+            self._changes.clear()
+            self._applied.notify_all()
+
+    def wait_for(self, version, timeout=10.0):
+        """Waits until this replica has caught up with ``version``; returns False on timeout."""
+        with self._applied:
+            return self._applied.wait_for(lambda: self.data['version'] >= version, timeout)
+
+    def _rollback(self, backup, applied, changes, mark):
+        """Undoes the events applied since ``mark`` by restoring ``backup``."""
+        for _ in range(len(applied) - mark):
+            self._changes.pop()
+        self._ended_rounds = [record for record in self._ended_rounds if record['seq'] <= backup['version']]
+        del applied[mark:]
+        del changes[mark:]
+        self.data = backup
+        self._reindex()
+
+    def _write_loop(self):
+        while True:
+            command = self._queue.get()
+            if command is None:
+                break
+            batch = [command]
+            # Whatever queued up meanwhile goes out with the same storage write
+            while len(batch) < self.max_batch:
+                try:
+                    command = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if command is None:
+                    self._process(batch)
+                    return
+                batch.append(command)
+            self._process(batch)
+
+    def _apply(self, event):
+        handler = getattr(self, '_on_' + event['type'], None)
+        if handler is None:
+            raise EventRejected(f"Unknown event type: {event['type']}")
+        return handler(event)
+
+    # Event handlers. They must only depend on the event and the current
+    # data so that replaying the log rebuilds exactly the same state.
+
+    def _reindex(self):
+        """Rebuilds the lookup tables after the lists were replaced wholesale."""
+        self._users = {}
+        for user in self.data['users']:
+            self._users.setdefault(user['username'], user)
+        self._leaderboard = Leaderboard(self._users.values())
+        self._answers = {}
+        self._answers_by_question = {}
+        self._votes = set()
+        for answer in self.data['answers']:
+            self._answers.setdefault(answer['id'], answer)
+            self._answers_by_question.setdefault(answer.get('question_id'), []).append(answer)
+            for vote in answer.get('votes', []):
+                self._votes.add((answer['id'], vote['username']))
+        # Answer IDs keep counting up, even across resets
+        self.data['last_answer_id'] = max([self.data.get('last_answer_id', 0)] + list(self._answers))
+
+    def _find_user(self, username):
+        return self._users.get(username)
+
+    def _find_answer(self, answer_id):
+        return self._answers.get(answer_id)
+
+    def _check_phase(self, question_id, name):
+        phase = self.data.get('phase')
+        if phase is not None and phase['question_id'] == question_id and phase['name'] != name:
+            raise EventRejected(PHASE_REFUSALS[name], 409)
+
+    def _on_user_joined(self, event):
+        if self._find_user(event['username']) is None:
+            user = {
+                "username": event['username'],
+                "avatar": event['avatar'],
+                "score": 0
+            }
+            self.data['users'].append(user)
+            self._users[user['username']] = user
+            self._leaderboard.update(user['username'], user['score'])
+
+    def _on_user_deleted(self, event):
+        user = self._users.pop(event['username'], None)
+        if user is None:
+            raise EventRejected('User not found', 404)
+        self.data['users'].remove(user)
+        self._leaderboard.remove(event['username'])
+
+    def _on_score_changed(self, event):
+        user = self._find_user(event['username'])
+        if user is None:
+            raise EventRejected('User not found', 404)
+        if not isinstance(event['delta'], int) or isinstance(event['delta'], bool):
+            raise EventRejected('Score changes must be whole numbers')
+        if user.get('score') is None:
+            user['score'] = 0  # Initialize score if it doesn't exist
+        user['score'] += event['delta']
+        self._leaderboard.update(user['username'], user['score'])
+        return user['score']
+
+    def _on_answer_submitted(self, event):
+        if event['question_id'] != self.current_question_id():
+            # An earlier question's round is archived already; taking the
+            # answer would archive that round a second time
+            raise EventRejected(QUESTION_CLOSED, 409)
+        self._check_phase(event['question_id'], 'answering')
+        # IDs are assigned here, by the single writer, and kept in the event for replay
+        if 'id' not in event:
+            event['id'] = self.data['last_answer_id'] + 1
+        self.data['last_answer_id'] = max(self.data['last_answer_id'], event['id'])
+        answer = {
+            "id": event['id'],
+            "question_id": event['question_id'],
+            "text": event['text'],
+            "username": event['username'],
+            "avatar": event['avatar'],
+            "votes": [],
+            "random_num": event['random_num'],
+            "visible": False
+        }
+        self.data['answers'].append(answer)
+        self._answers.setdefault(answer['id'], answer)
+        self._answers_by_question.setdefault(answer['question_id'], []).append(answer)
+        return event['id']
+
+    def _on_vote_cast(self, event):
+        answer = self._find_answer(event['answer_id'])
+        if answer is None:
+            raise EventRejected('Failed to vote')
+        self._check_phase(answer.get('question_id'), 'voting')
+        # Ensure each user votes only once
+        key = (answer['id'], event['username'])
+        if key in self._votes:
+            raise EventRejected('Failed to vote')
+        answer.setdefault('votes', []).append({"username": event['username'], "avatar": event['avatar']})
+        self._votes.add(key)
+
+    def _on_answer_visibility_toggled(self, event):
+        answer = self._find_answer(event['answer_id'])
+        if answer is None:
+            raise EventRejected('Answer not found', 404)
+        answer['visible'] = not answer['visible']
+        return answer['visible']
+
+    def _on_answer_correct_toggled(self, event):
+        answer = self._find_answer(event['answer_id'])
+        if answer is None:
+            raise EventRejected('Answer not found', 404)
+        answer['is_correct'] = not answer.get('is_correct', False)
+        return answer['is_correct']
+
+    def _on_question_added(self, event):
+        if 'id' not in event:
+            event['id'] = max((q['id'] for q in self.data['questions']), default=0) + 1
+        self.data['questions'].append({"id": event['id'], "text": event['text']})
+
+    def _on_question_removed(self, event):
+        self.data['questions'] = [q for q in self.data['questions'] if q['id'] != event['id']]
+
+    def _on_current_question_set(self, event):
+        previous = self.data.get('current_question') or {}
+        self.data['current_question'] = event['question']
+        # A timed round starts with its own phase_started event
+        self.data.pop('phase', None)
+
+        # The rounds of every other question end here and leave the live data
+        question_id = event['question'].get('id')
+        ended = {}
+        for answer in self.data['answers']:
+            if answer.get('question_id') != question_id:
+                ended.setdefault(answer.get('question_id'), []).append(answer)
+        if not ended:
+            return
+        if 'archived_at' not in event:
+            event['archived_at'] = round(time.time(), 3)
+        questions = {question['id']: question for question in self.data['questions']}
+        scored = self.data.setdefault('round_points', {})
+        for ended_id, answers in ended.items():
+            question = previous if previous.get('id') == ended_id else questions.get(ended_id, {'id': ended_id})
+            self._ended_rounds.append({
+                'seq': event.get('seq', self.data['version'] + 1),
+                'question': dict(question),
+                'answers': answers,
+                'points': scored.pop(str(ended_id), {}),
+                'archived_at': event['archived_at']
+            })
+        self.data['answers'] = [answer for answer in self.data['answers']
+                                if answer.get('question_id') == question_id]
+        self._reindex()
+
+    def _on_phase_started(self, event):
+        """Moves the current question to another phase; returns the new phase.
+
+        With ``from_phase``, the event is refused unless the question is
+        still in that phase, so a deadline that fires after the admin moved
+        on changes nothing. Opening the vote shows every answer of the round.
+        """
+        if event['phase'] not in PHASES:
+            raise EventRejected('Unknown phase')
+        question_id = self.current_question_id()
+        if question_id is None:
+            raise EventRejected('No question selected', 409)
+        phase = self.data.get('phase')
+        current = phase['name'] if phase is not None and phase['question_id'] == question_id else None
+        if 'from_phase' in event and event['from_phase'] != current:
+            raise EventRejected('The phase has already changed', 409)
+        self.data['phase'] = {
+            'question_id': question_id,
+            'name': event['phase'],
+            'deadline': event.get('deadline'),
+            # How long each phase of this round lasts; 0 waits for the admin
+            'durations': event.get('durations', phase['durations'] if current else {})
+        }
+        if event['phase'] == 'voting':
+            for answer in self.answers_for(question_id):
+                answer['visible'] = True
+        return dict(self.data['phase'])
+
+    def _on_votes_cleared(self, event):
+        for answer in self.data['answers']:
+            answer['votes'] = []
+        self._votes.clear()
+
+    def _on_votes_revealed(self, event):
+        """Scores the current question's votes; returns the points per user.
+
+        Each question is scored once: revealing it again awards nothing and
+        returns the breakdown from the first reveal.
+        """
+        self.data['reveal'] = True
+        if 'question_id' not in event:
+            event['question_id'] = self.current_question_id()
+        question_id = event['question_id']
+        phase = self.data.get('phase')
+        if phase is not None and phase['question_id'] == question_id:
+            # Revealing ends a timed round early too
+            phase.update(name='reveal', deadline=None)
+        scored = self.data.setdefault('round_points', {})
+        key = str(question_id)
+        if key in scored:
+            return scored[key]
+
+        answers = self.data['answers'] if question_id is None else self.answers_for(question_id)
+        points = round_points(answers)
+        # What each player was awarded is kept in the event for the storage
+        # backend; a later event of the same batch may archive the round
+        event['awarded'] = {}
+        for username, earned in points.items():
+            user = self._find_user(username)
+            if user is not None:
+                user['score'] = (user.get('score') or 0) + earned
+                self._leaderboard.update(username, user['score'])
+                event['awarded'][username] = earned
+        scored[key] = points
+        return points
+
+    def _on_room_created(self, event):
+        self.data['room'] = event['room']
+
+    def _on_game_reset(self, event):
+        self.data = {
+            "questions": event['questions'],
+            "answers": [],
+            "votes": [],
+            "reveal": False,
+            "users": self.data.get('users', []),  # Preserve users array
+            "round_points": {},
+            "version": self.data['version'],
+            "last_answer_id": self.data['last_answer_id']
+        }
+        self._reindex()
+
+    def _on_game_imported(self, event):
+        # Starts a restore; the records follow in 'records_imported' events
+        room = self.data.get('room')
+        self.data = {
+            "questions": [],
+            "answers": [],
+            "votes": [],
+            "reveal": event['reveal'],
+            "users": [],
+            "current_question": event['current_question'],
+            "round_points": event['round_points'],
+            "version": self.data['version'],
+            "last_answer_id": max(self.data['last_answer_id'], event.get('last_answer_id', 0))
+        }
+        if room is not None:
+            self.data['room'] = room
+        self._reindex()
+
+    def _on_records_imported(self, event):
+        """Adds a batch of restored records; returns how many of each were added.
+
+        Records whose username or ID is already taken are left out, of the
+        event too, so the logged event lists exactly what was added.
+        """
+        users = []
+        for user in event['users']:
+            if self._find_user(user['username']) is None:
+                self.data['users'].append(user)
+                self._users[user['username']] = user
+                self._leaderboard.update(user['username'], user.get('score') or 0)
+                users.append(user)
+
+        question_ids = {question['id'] for question in self.data['questions']}
+        questions = []
+        for question in event['questions']:
+            if question['id'] not in question_ids:
+                self.data['questions'].append(question)
+                question_ids.add(question['id'])
+                questions.append(question)
+
+        answers = []
+        for answer in event['answers']:
+            if self._find_answer(answer['id']) is None:
+                self.data['answers'].append(answer)
+                self._answers[answer['id']] = answer
+                self._answers_by_question.setdefault(answer.get('question_id'), []).append(answer)
+                for vote in answer.get('votes', []):
+                    self._votes.add((answer['id'], vote['username']))
+                self.data['last_answer_id'] = max(self.data['last_answer_id'], answer['id'])
+                answers.append(answer)
+
+        # Imported rounds join the archive as rounds ended by this event
+        seq = event.get('seq', self.data['version'] + 1)
+        self._ended_rounds.extend(dict(record, seq=seq) for record in event['rounds'])
+
+        event.update(users=users, questions=questions, answers=answers)
+        return {'users': len(users), 'questions': len(questions), 'answers': len(answers),
+                'rounds': len(event['rounds'])}
+
+    def _on_game_data_updated(self, event):
+        self.data['users'] = event['users']
+        self.data['answers'] = event['answers']
+        self.data['questions'] = event['questions']
+        self._reindex()
+
+    # Client-facing changes. Built right after the event was applied, from
+    # copies of the affected records, so later events cannot alter them.
+    # Changes about a single answer carry its 'question_id' so they can be
+    # delivered only to clients looking at that question.
+
+    def _describe(self, event):
+        describe = getattr(self, '_describe_' + event['type'], None)
+        if describe is None:
+            # Wholesale replacements; clients simply reload the full state
+            return {'type': 'reset'}
+        return describe(event)
+
+    def _describe_user_joined(self, event):
+        return {'type': 'user_added', 'user': dict(self._users[event['username']])}
+
+    def _describe_user_deleted(self, event):
+        return {'type': 'user_removed', 'username': event['username']}
+
+    def _describe_score_changed(self, event):
+        user = self._users[event['username']]
+        return {'type': 'score_changed', 'username': user['username'], 'score': user['score']}
+
+    def _describe_answer_submitted(self, event):
+        answer = dict(self._answers[event['id']], votes=[])
+        return {'type': 'answer_added', 'question_id': answer['question_id'], 'answer': answer}
+
+    def _describe_vote_cast(self, event):
+        answer = self._answers[event['answer_id']]
+        return {'type': 'vote_added', 'question_id': answer.get('question_id'),
+                'answer_id': event['answer_id'],
+                'vote': {'username': event['username'], 'avatar': event['avatar']}}
+
+    def _describe_answer_visibility_toggled(self, event):
+        answer = self._answers[event['answer_id']]
+        return {'type': 'visibility_changed', 'question_id': answer.get('question_id'),
+                'answer_id': event['answer_id'], 'visible': answer['visible']}
+
+    def _describe_answer_correct_toggled(self, event):
+        answer = self._answers[event['answer_id']]
+        return {'type': 'correct_changed', 'question_id': answer.get('question_id'),
+                'answer_id': event['answer_id'], 'is_correct': answer['is_correct']}
+
+    def _describe_question_added(self, event):
+        return {'type': 'question_added', 'question': {'id': event['id'], 'text': event['text']}}
+
+    def _describe_question_removed(self, event):
+        return {'type': 'question_removed', 'id': event['id']}
+
+    def _describe_current_question_set(self, event):
+        return {'type': 'question_changed', 'question': dict(event['question'])}
+
+    def _describe_phase_started(self, event):
+        return {'type': 'phase_changed', 'phase': dict(self.data['phase'])}
+
+    def _describe_votes_cleared(self, event):
+        return {'type': 'votes_cleared'}
+
+    def _describe_votes_revealed(self, event):
+        return {'type': 'votes_revealed',
+                'points': self.data['round_points'][str(event['question_id'])],
+                'scores': {user['username']: user.get('score') or 0 for user in self.data['users']}}
+
+    # Persistence
+
+    def flush(self):
+        """Snapshots the data to disk if anything changed since the last flush."""
+        with self.lock:
+            if not self._dirty:
+                return True
+            if not self.storage.snapshots:
+                # The backend persisted every event as it was committed,
+                # unless a batch failed; its rows no longer match memory then
+                if self._resync:
+                    try:
+                        with STORAGE_SECONDS.labels('snapshot').time():
+                            self._run_blocking(self.storage.write_all, self.data)
+                    except Exception as e:
+                        logger.error(f"Error saving data: {str(e)}")
+                        return False
+                    self._resync = False
+                self._dirty = False
+                return True
+            try:
+                payload = json.dumps(self.data, indent=4, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error serializing data: {str(e)}")
+                return False
+            self._run_blocking(self.storage.begin_snapshot)
+            self._dirty = False
+
+        try:
+            with STORAGE_SECONDS.labels('snapshot').time():
+                self._run_blocking(self.storage.write_snapshot, payload)
+                self._run_blocking(self.storage.end_snapshot)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving data: {str(e)}")
+            self._dirty = True
+            return False
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        """Starts the writer and background snapshot threads."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='game-state-writer', daemon=True)
+            self._writer.start()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='game-state-flush', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Drains queued events, stops both threads, writes pending changes and closes the storage."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.storage.close()
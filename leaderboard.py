@@ -0,0 +1,67 @@
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    """Players ordered by score, kept sorted as scores change.
+
+    Entries are ``(-score, username)`` tuples in a sorted list, so the best
+    players come first and ties are ordered by name. A score update is a
+    binary search plus a list insert; top-N, pages and ranks are read
+    without sorting anything. Ranks are competition ranks: players with
+    the same score share a rank, and the next rank skips accordingly.
+    """
+
+    def __init__(self, users=()):
+        self._scores = {}
+        self._entries = []
+        for user in users:
+            self._scores[user['username']] = user.get('score') or 0
+        self._entries = sorted((-score, username) for username, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, username, score):
+        """Adds a player, or moves them to their new score."""
+        score = score or 0
+        old = self._scores.get(username)
+        if old == score:
+            return
+        if old is not None:
+            self._discard(username, old)
+        self._scores[username] = score
+        insort(self._entries, (-score, username))
+
+    def remove(self, username):
+        old = self._scores.pop(username, None)
+        if old is not None:
+            self._discard(username, old)
+
+    def _discard(self, username, score):
+        index = bisect_left(self._entries, (-score, username))
+        del self._entries[index]
+
+    def rank(self, username):
+        """Returns the 1-based rank of a player, or None if they are not listed."""
+        score = self._scores.get(username)
+        if score is None:
+            return None
+        # (-score,) sorts before every entry with that score
+        return bisect_left(self._entries, (-score,)) + 1
+
+    def page(self, offset=0, limit=10):
+        """Returns ``(rank, username, score)`` for the players at positions offset..offset+limit."""
+        rows = []
+        for index in range(max(offset, 0), min(offset + limit, len(self._entries))):
+            negative_score, username = self._entries[index]
+            if rows and rows[-1][2] == -negative_score:
+                rank = rows[-1][0]
+            elif index > 0 and self._entries[index - 1][0] == negative_score:
+                rank = bisect_left(self._entries, (negative_score,)) + 1
+            else:
+                rank = index + 1
+            rows.append((rank, username, -negative_score))
+        return rows
+
+    def top(self, limit=10):
+        return self.page(0, limit)
@@ -0,0 +1,395 @@
+"""Load test: plays complete rounds against a server with simulated players.
+
+Starts app.py on a free port with a throwaway data file (or uses --url),
+logs in PLAYERS players and an admin, connects every player over Socket.IO
+and plays ROUNDS rounds: the admin picks a question, every player submits an
+answer, the admin marks one answer correct, every player votes for someone
+else's answer, and the admin reveals the votes. Then it reports:
+
+- throughput and p50/p95/p99 latency of every route,
+- how long the 'state_delta' events took to reach the players, counted from
+  the request that caused them,
+- failed checks: lost answers, votes or deltas, gaps in the delta versions,
+  and points or scores that differ from the votes that were cast.
+
+    python loadtest.py --players 200 --rounds 3
+    ADMIN_PASSWORD=... USER_PASSWORD=... python loadtest.py --url http://localhost:5000
+
+The server started here inherits the environment, so e.g.
+``DATA_STORAGE=sqlite ASYNC_MODE=eventlet python loadtest.py`` measures that
+setup. --json writes the results to a file, to compare runs before an event.
+Exits with status 1 if a check failed.
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import socketio
+
+from game_state import round_points
+from storage import empty_data
+
+AVATAR = '/static/avatars/1.webp'
+
+
+class Stats:
+    """Latencies per route and delivery lags of state deltas, in seconds."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lags = []
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def lag(self, seconds):
+        with self._lock:
+            self.lags.append(seconds)
+
+    def fail(self, message):
+        with self._lock:
+            self.failures.append(message)
+        print(f"FAILED: {message}")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary(values, duration=None):
+    result = {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1),
+    }
+    if duration:
+        result['per_second'] = round(len(values) / duration, 1)
+    return result
+
+
+class Client:
+    """One HTTP session with the server; every request is timed."""
+
+    def __init__(self, url, stats):
+        self.url = url
+        self.stats = stats
+        self.http = requests.Session()
+
+    def request(self, method, route, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.url + route, timeout=30, **kwargs)
+        except requests.RequestException as e:
+            self.stats.record(route, time.perf_counter() - started, False)
+            self.stats.fail(f"{method} {route}: {str(e)}")
+            return None
+        self.stats.record(route, time.perf_counter() - started, response.ok)
+        return response
+
+    def json(self, method, route, **kwargs):
+        response = self.request(method, route, **kwargs)
+        if response is None or not response.ok:
+            status = 'no response' if response is None else response.status_code
+            self.stats.fail(f"{method} {route}: {status}")
+            return None
+        return response.json()
+
+
+class Player(Client):
+    """A player with a Socket.IO connection that watches for its deltas."""
+
+    def __init__(self, url, stats, username, sent, over_socket=False):
+        super().__init__(url, stats)
+        self.username = username
+        # Send answers and votes as Socket.IO events instead of HTTP requests
+        self.over_socket = over_socket
+        # When each answer and vote was sent, shared by all players: (kind, username, ...) -> time
+        self.sent = sent
+        self.seen = set()
+        self.version = None
+        self.gaps = 0
+        self.socket = socketio.Client(http_session=self.http, reconnection=False)
+        self.socket.on('state_delta', self._on_delta)
+
+    def join(self, password):
+        self.json('POST', '/login', data={'password': password})
+        self.json('POST', '/userlogin', data={'username': self.username, 'avatar': AVATAR})
+        self.socket.connect(self.url, transports=['websocket'])
+
+    def _on_delta(self, delta):
+        received = time.perf_counter()
+        if self.version is not None and delta['from'] != self.version:
+            self.gaps += 1
+        self.version = delta['version']
+        for change in delta['changes']:
+            if change['type'] == 'answer_added':
+                key = ('answer', change['answer']['username'], change['answer']['text'])
+            elif change['type'] == 'vote_added':
+                key = ('vote', change['vote']['username'], change['answer_id'])
+            else:
+                continue
+            sent = self.sent.get(key)
+            if sent is not None:
+                self.stats.lag(received - sent)
+            self.seen.add(key)
+
+    def action(self, event, payload):
+        """Sends an answer or vote; returns the server's result, or None on an error."""
+        if not self.over_socket:
+            return self.json('POST', f'/{event}', json=payload)
+        started = time.perf_counter()
+        try:
+            result = self.socket.call(event, payload, timeout=30)
+        except socketio.exceptions.SocketIOError as e:
+            result = None
+            self.stats.fail(f"socket {event}: {str(e)}")
+        ok = bool(result and result.get('success'))
+        self.stats.record(f'socket:{event}', time.perf_counter() - started, ok)
+        return result
+
+    def submit(self, text):
+        self.sent[('answer', self.username, text)] = time.perf_counter()
+        self.action('submit_answer', {'answer': text, 'avatar': AVATAR})
+
+    def vote(self):
+        """Votes for a random answer by someone else; returns its ID, or None."""
+        state = self.json('GET', '/get_game_state')
+        if state is None:
+            return None
+        candidates = [answer['id'] for answer in state['answers'] if answer['username'] != self.username]
+        if not candidates:
+            return None
+        answer_id = random.choice(candidates)
+        self.sent[('vote', self.username, answer_id)] = time.perf_counter()
+        result = self.action('vote', {'answer_id': answer_id, 'avatar': AVATAR})
+        return answer_id if result and result.get('success') else None
+
+    def close(self):
+        self.socket.disconnect()
+
+
+def wait_for_deliveries(players, keys, stats, timeout):
+    """Waits until every player has seen every key; fails for the ones still missing."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(keys <= player.seen for player in players):
+            return
+        time.sleep(0.05)
+    missing = sum(len(keys - player.seen) for player in players)
+    stats.fail(f"{missing} of {len(keys) * len(players)} deliveries did not arrive within {timeout}s")
+
+
+def play_round(number, question_id, admin, players, pool, stats, timeout):
+    admin.json('POST', '/set_next_question', json={'question_id': question_id})
+
+    # Every player answers
+    texts = {player.username: f"{player.username} round {number}" for player in players}
+    list(pool.map(lambda player: player.submit(texts[player.username]), players))
+    wait_for_deliveries(players, {('answer', name, text) for name, text in texts.items()}, stats, timeout)
+
+    state = admin.json('GET', '/get_game_state')
+    answers = {answer['username']: answer for answer in state['answers']} if state else {}
+    lost = [name for name, text in texts.items() if answers.get(name, {}).get('text') != text]
+    if lost:
+        stats.fail(f"round {number}: answers of {len(lost)} players are missing")
+        return {}
+    correct = random.choice(list(answers.values()))
+    admin.json('POST', '/mark_correct', json={'answer_id': correct['id']})
+
+    # Every player votes; only votes the server accepted are counted
+    chosen = list(pool.map(lambda player: player.vote(), players))
+    votes = {}
+    for player, answer_id in zip(players, chosen):
+        if answer_id is not None:
+            votes.setdefault(answer_id, []).append(player.username)
+    wait_for_deliveries(players, {('vote', name, answer_id) for answer_id, names in votes.items()
+                                  for name in names}, stats, timeout)
+
+    state = admin.json('GET', '/get_game_state') or {'answers': []}
+    for answer in state['answers']:
+        recorded = sorted(vote['username'] for vote in answer['votes'])
+        if recorded != sorted(votes.get(answer['id'], [])):
+            stats.fail(f"round {number}: answer {answer['id']} has {len(recorded)} votes, "
+                       f"expected {len(votes.get(answer['id'], []))}")
+
+    expected = round_points([
+        {'username': answer['username'], 'is_correct': answer['id'] == correct['id'],
+         'votes': [{'username': name} for name in votes.get(answer['id'], [])]}
+        for answer in answers.values()])
+    result = admin.json('POST', '/reveal_votes_admin') or {}
+    if result.get('points') != expected:
+        stats.fail(f"round {number}: reveal awarded {result.get('points')}, expected {expected}")
+    return expected
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(directory, questions, admin_password, user_password, verbose=False):
+    """Runs app.py on a throwaway data file; returns the process and its URL."""
+    data = dict(empty_data(), questions=[{'id': i, 'text': f"Question {i}"} for i in range(1, questions + 1)])
+    data_file = os.path.join(directory, 'game_data.json')
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), GAME_DATA_FILE=data_file,
+               ROOMS_DIR=os.path.join(directory, 'rooms'),
+               DATA_SQLITE_FILE=os.path.join(directory, 'game_data.db'),
+               ADMIN_PASSWORD=admin_password, USER_PASSWORD=user_password,
+               SESSION_COOKIE_SECURE='false', WORKERS='1', WORKER_ID='0')
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, app_path], env=env, cwd=directory,
+                               stdout=output, stderr=output)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            requests.get(url + '/login', timeout=1)
+            return process, url
+        except requests.RequestException:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError('The server did not start')
+            time.sleep(0.2)
+
+
+def stop_server(process):
+    # SIGINT lets it write out pending changes, as workers.py does
+    if os.name == 'nt':
+        process.terminate()
+    else:
+        process.send_signal(signal.SIGINT)
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run(url, args, admin_password, user_password):
+    stats = Stats()
+    sent = {}
+    admin = Client(url, stats)
+    admin.json('POST', '/admin_login', data={'password': admin_password})
+    questions = (admin.json('GET', '/get_questions') or {}).get('questions', [])
+    if not questions:
+        raise RuntimeError('The server has no questions to play')
+
+    players = [Player(url, stats, f"{args.prefix}{i:04d}", sent, args.socket_actions)
+               for i in range(args.players)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda player: player.join(user_password), players))
+        state = admin.json('GET', '/get_game_state') or {'users': []}
+        scores = {user['username']: user['score'] for user in state['users']}
+        initial = {player.username: scores.get(player.username, 0) for player in players}
+
+        totals = dict(initial)
+        for number in range(1, args.rounds + 1):
+            question = questions[(number - 1) % len(questions)]
+            points = play_round(number, question['id'], admin, players, pool, stats, args.timeout)
+            for username, earned in points.items():
+                totals[username] = totals.get(username, 0) + earned
+            print(f"Round {number} done")
+
+        state = admin.json('GET', '/get_game_state') or {'users': []}
+        scores = {user['username']: user['score'] for user in state['users']}
+        wrong = [name for name, score in totals.items() if scores.get(name) != score]
+        if wrong:
+            stats.fail(f"{len(wrong)} players ended with a wrong score")
+        gaps = sum(player.gaps for player in players)
+        if gaps:
+            stats.fail(f"{gaps} state deltas did not follow on from the previous one")
+        list(pool.map(lambda player: player.close(), players))
+    duration = time.perf_counter() - started
+
+    return {
+        'players': args.players,
+        'rounds': args.rounds,
+        'duration_s': round(duration, 2),
+        'requests_per_second': round(sum(map(len, stats.latencies.values())) / duration, 1),
+        'routes': {route: dict(summary(values, duration), errors=stats.errors.get(route, 0))
+                   for route, values in sorted(stats.latencies.items())},
+        'delta_lag': summary(stats.lags) if stats.lags else None,
+        'failures': stats.failures,
+    }
+
+
+def report(results):
+    print(f"\n{results['players']} players, {results['rounds']} rounds in {results['duration_s']}s, "
+          f"{results['requests_per_second']} requests/s")
+    print(f"{'route':<24}{'count':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for route, row in results['routes'].items():
+        print(f"{route:<24}{row['count']:>7}{row['per_second']:>9}{row['p50_ms']:>9}"
+              f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['errors']:>8}")
+    lag = results['delta_lag']
+    if lag:
+        print(f"{'delta delivery lag':<24}{lag['count']:>7}{'':>9}{lag['p50_ms']:>9}"
+              f"{lag['p95_ms']:>9}{lag['p99_ms']:>9}")
+    print(f"\n{len(results['failures'])} failed checks" if results['failures'] else "\nAll checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plays complete rounds against the quiz server.')
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=50, help='players acting at the same time')
+    parser.add_argument('--url', help='server to test; by default a local one is started')
+    parser.add_argument('--prefix', default='loadtest-', help='start of the player names')
+    parser.add_argument('--socket-actions', action='store_true',
+                        help='send answers and votes as Socket.IO events instead of HTTP requests')
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help='seconds to wait for the deltas of each phase')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the started server's output")
+    args = parser.parse_args()
+
+    if args.url:
+        admin_password = os.getenv('ADMIN_PASSWORD')
+        user_password = os.getenv('USER_PASSWORD')
+        if not admin_password or not user_password:
+            parser.error('set ADMIN_PASSWORD and USER_PASSWORD to test a running server')
+        results = run(args.url.rstrip('/'), args, admin_password, user_password)
+    else:
+        admin_password, user_password = secrets.token_hex(8), secrets.token_hex(8)
+        with tempfile.TemporaryDirectory() as directory:
+            process, url = start_server(directory, args.rounds, admin_password, user_password,
+                                           args.verbose)
+            try:
+                results = run(url, args, admin_password, user_password)
+            finally:
+                stop_server(process)
+
+    report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 1 if results['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads handling the chosen routes.
+
+    While running, a background thread looks at those threads every
+    ``interval`` seconds and counts their stacks, collapsed into one line per
+    stack (``route;outermost frame;...;innermost frame count``), the input
+    format of flamegraph.pl and speedscope. ``stop()`` writes the counts to
+    ``<directory>/profile-<time>.collapsed``. While stopped it costs one
+    attribute check per request.
+
+    Requests are matched to stacks by thread, so this needs real threads
+    (ASYNC_MODE=threading).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.running = False
+        self.routes = None
+        self.interval = 0.005
+        self._threads = {}  # thread ident -> route of the request it is handling
+        self._stacks = Counter()
+        self._samples = 0
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, interval=0.005, routes=None):
+        """Starts sampling ``routes`` (every route if None). False if already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval
+            self.routes = set(routes) if routes is not None else None
+            self._threads.clear()
+            self._stacks = Counter()
+            self._samples = 0
+            self._started = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self.running = True
+            self._thread.start()
+            return True
+
+    def enter(self, route):
+        """Marks the calling thread as handling a request for ``route``."""
+        if self.routes is None or route in self.routes:
+            self._threads[threading.get_ident()] = route
+
+    def leave(self):
+        self._threads.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, route in list(self._threads.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(route)
+                    self._stacks[';'.join(reversed(stack))] += 1
+            self._samples += 1
+
+    def stop(self):
+        """Stops sampling and writes the profile. Returns its summary, or None if not running."""
+        with self._lock:
+            if not self.running:
+                return None
+            self._stop.set()
+            self._thread.join()
+            self.running = False
+            self._threads.clear()
+
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started))
+            path = os.path.join(self.directory, f'profile-{stamp}.collapsed')
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            return {'path': path, 'samples': self._samples,
+                    'stacks': sum(self._stacks.values()), 'seconds': round(time.time() - self._started, 1)}
+
+    def status(self):
+        return {'running': self.running, 'interval': self.interval,
+                'routes': sorted(self.routes) if self.routes is not None else None,
+                'samples': self._samples, 'stacks': sum(list(self._stacks.values()))}
@@ -0,0 +1,72 @@
+import math
+import threading
+import time
+
+
+def parse_budgets(text):
+    """Parses ``name=rate:burst,...`` (requests per second, and how many may
+    come at once) into ``{name: (rate, burst)}``. A rate of 0 means no limit.
+    """
+    budgets = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, spec = item.partition('=')
+        rate, _, burst = spec.partition(':')
+        rate = float(rate)
+        budgets[name.strip()] = (rate, float(burst) if burst else max(rate, 1.0))
+    return budgets
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, one set per named budget.
+
+    A budget of ``(rate, burst)`` lets a client make ``burst`` requests at
+    once and then ``rate`` per second. Buckets live in memory, keyed by
+    budget and client; a bucket that has been idle long enough to be full
+    again is dropped, so clients that went away cost nothing.
+    """
+
+    def __init__(self, budgets, sweep_interval=60.0):
+        self.budgets = budgets
+        self.sweep_interval = sweep_interval
+        self._buckets = {}  # (budget, client) -> [tokens, last update]
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def acquire(self, budget, client):
+        """Takes a token; returns 0 if allowed, else the seconds until one is available."""
+        limit = self.budgets.get(budget)
+        if limit is None or limit[0] <= 0:
+            return 0
+        rate, burst = limit
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            bucket = self._buckets.get((budget, client))
+            if bucket is None:
+                bucket = self._buckets[(budget, client)] = [burst, now]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def _sweep(self, now):
+        self._last_sweep = now
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.budgets[key[0]][0] >= self.budgets[key[0]][1]]
+        for key in full:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def retry_after_header(seconds):
+    """Retry-After is in whole seconds; round up so clients do not come back too early."""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,78 @@
+import re
+import threading
+
+# Room IDs end up in file names and Socket.IO room names
+ROOM_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+
+def valid_room_id(room_id):
+    return isinstance(room_id, str) and ROOM_ID_PATTERN.match(room_id) is not None
+
+
+class RoomRegistry:
+    """The game rooms hosted by this process, each with its own GameState.
+
+    A room is only loaded the first time it is used; until then it costs
+    nothing but its files on disk. ``open_room(room_id)`` builds the (not yet
+    started) GameState of a room and ``room_exists(room_id)`` tells whether a
+    room that is not loaded has been saved before.
+    """
+
+    def __init__(self, open_room, room_exists):
+        self._open_room = open_room
+        self._room_exists = room_exists
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def get(self, room_id):
+        """Returns the GameState of an existing room, loading it if needed, or None."""
+        state = self._rooms.get(room_id)
+        if state is not None:
+            return state
+        if not valid_room_id(room_id) or not self._room_exists(room_id):
+            return None
+        return self._load(room_id)
+
+    def open(self, room_id):
+        """Returns a room, loading it even if it was never saved. None if the ID is invalid."""
+        if not valid_room_id(room_id):
+            return None
+        return self._rooms.get(room_id) or self._load(room_id)
+
+    def create(self, room_id):
+        """Creates a new, empty room. Returns None if the ID is invalid or already taken."""
+        if not valid_room_id(room_id):
+            return None
+        with self._lock:
+            if room_id in self._rooms or self._room_exists(room_id):
+                return None
+            state = self._start(room_id)
+        # Written to disk right away, so the room exists after a restart too
+        state.commit({'type': 'room_created', 'room': room_id})
+        state.flush()
+        return state
+
+    def _load(self, room_id):
+        with self._lock:
+            state = self._rooms.get(room_id)
+            if state is None:
+                state = self._start(room_id)
+            return state
+
+    def _start(self, room_id):
+        state = self._open_room(room_id)
+        state.start()
+        self._rooms[room_id] = state
+        return state
+
+    def loaded(self):
+        """Returns the IDs of the rooms currently in memory."""
+        return list(self._rooms)
+
+    def stop(self):
+        """Stops every loaded room, writing out pending changes."""
+        with self._lock:
+            rooms = list(self._rooms.values())
+            self._rooms.clear()
+        for state in rooms:
+            state.stop()
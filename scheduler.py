@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """Calls a function when a wall-clock deadline passes, at most one per key.
+
+    Scheduling a key again replaces its pending call, so each room has one
+    timer for the end of its current phase. Deadlines are ``time.time()``
+    values; one that already passed fires right away. A single background
+    thread sleeps until the earliest deadline, so an idle room costs nothing.
+    Calls scheduled before ``start()`` wait for it.
+    """
+
+    def __init__(self):
+        self._timers = {}  # key -> (deadline, callback)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, key, deadline, callback):
+        with self._condition:
+            self._timers[key] = (deadline, callback)
+            self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            self._timers.pop(key, None)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='deadline-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._timers:
+                        key, (deadline, callback) = min(self._timers.items(), key=lambda item: item[1][0])
+                        wait = deadline - time.time()
+                        if wait <= 0:
+                            del self._timers[key]
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                if self._stopped:
+                    return
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error running the scheduled call for {key}: {str(e)}")
@@ -0,0 +1,409 @@
+// static/js/admin.js
+
+// Admin page: question, answer and player management.
+
+const socket = wire.socket();
+
+let adminSync = null; // Local copy of the game state, see static/js/game_state.js
+let answers = [];
+
+// Fill the question list from the synced state
+function renderQuestions() {
+    const data = adminSync && adminSync.state;
+    if (!data) return;
+    const questionSelect = document.getElementById('questionSelect');
+    const selectedId = questionSelect.value; // Keep the admin's choice across updates
+    questionSelect.innerHTML =
+        '<option selected disabled>Select a question</option>'; // Reset options
+
+    data.questions.forEach(question => {
+        const option = document.createElement('option');
+        option.value = question.id;
+        option.textContent = question.text;
+        questionSelect.appendChild(option);
+    });
+    if (data.questions.some(question => String(question.id) === selectedId)) {
+        questionSelect.value = selectedId;
+    }
+}
+
+function toggleAnswerVisibility(answerId) {
+    fetch('/toggle_answer_visibility', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            answer_id: answerId
+        })
+    })
+        .then(response => response.json())
+        .then(data => {
+            // Find the button element and update its text
+            const buttonElement = document.getElementById(`toggleButton-${data.answer_id}`);
+            if (data.visible) {
+                buttonElement.textContent =
+                    'Hide Answer'; // Change to "Hide Answer" if the answer is visible
+            } else {
+                buttonElement.textContent =
+                    'Show Answer'; // Change to "Show Answer" if the answer is hidden
+            }
+            Swal.fire({
+                title: "Visibility Status",
+                text: `Visibility for answer ${data.answer_id} has been ${data.visible ? 'disabled' : 'enabled'}.`,
+                icon: data.visible ? "error" : "success",
+                confirmButtonText: "OK"
+            });
+
+        })
+        .catch(error => console.error('Error toggling answer visibility:', error));
+}
+let votesRevealed = false;
+
+// Reveal votes and toggle visibility
+function revealVotes() {
+    fetch('/reveal_votes_admin', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    })
+        .then(response => response.json())
+        .then(data => {
+            Swal.fire({
+                title: "Votes Revealed",
+                text: "Votes revealed to all players!",
+                icon: "info",
+                confirmButtonText: "OK"
+            });
+            renderAnswers(); // Re-render the answers after revealing votes
+            toggleVisibility(); // Toggle the visibility of the answers
+        })
+        .catch(error => console.error('Error revealing votes:', error));
+}
+
+// Set next question based on dropdown selection
+function setNextQuestion() {
+    const questionId = document.getElementById('questionSelect').value;
+
+    if (!questionId) {
+        Swal.fire({
+            title: "Selection Required",
+            text: "Please select a question.",
+            icon: "warning",
+            confirmButtonText: "OK"
+        });
+        return;
+    }
+
+    fetch('/set_next_question', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            question_id: parseInt(questionId)
+        })
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                Swal.fire({
+                    title: "Success",
+                    text: `Next question set: ${data.question.text}`,
+                    icon: "success",
+                    confirmButtonText: "OK"
+                });
+            } else {
+                Swal.fire({
+                    title: "Error",
+                    text: "Failed to set the next question.",
+                    icon: "error",
+                    confirmButtonText: "OK"
+                });
+            }
+        })
+        .catch(error => console.error('Error setting next question:', error));
+}
+
+// Display the answers from the synced state
+function renderAnswers() {
+    if (!adminSync || !adminSync.state) return;
+    answers = adminSync.state.answers; // The answers array is updated with the latest data
+    updatePage(); // Update the UI with the updated answers
+}
+
+// Update the page with answers and votes
+function updatePage() {
+    const answersContainer = document.getElementById('answers');
+    answersContainer.innerHTML = ''; // Clear previous answers
+
+    answers.forEach(answer => {
+        const answerElement = document.createElement('div');
+        answerElement.classList.add('col-sm-12', 'col-md-6', 'mb-4', 'justify-content-center');
+        answerElement.id = `answer-${answer.id}`; // Give each answer an ID for easy access
+        answerElement.innerHTML = `
+<div class="card shadow-sm">
+<div class="card-body">
+    <h5 class="card-title text-info">Created By: ${answer.username}</h5>
+    <h5 class="card-title text-primary">Answer: ${answer.text}</h5>
+    <p class="card-text"><strong>Voted By:</strong> ${answer.votes.map(vote => vote.username).join(', ')}</p>
+    <p class="card-text"><strong>Correct:</strong> ${answer.is_correct ? 'Yes' : 'No'}</p>
+    <p class="card-text"><strong>Visible:</strong> ${answer.visible ? 'Yes' : 'No'}</p>
+    <div class="d-flex justify-content-start">
+        <button class="btn ${answer.is_correct ? 'btn-danger' : 'btn-success'}"
+                onclick="markAsCorrect(${answer.id}, this)">
+            ${answer.is_correct ? 'Mark as Incorrect' : 'Mark as Correct'}
+        </button>
+        <button id="toggleButton-${answer.id}" class="btn ${answer.visible ? 'btn-secondary' : 'btn-light'} ms-3"
+                onclick="toggleAnswerVisibility(${answer.id})">
+            ${answer.visible ? 'Hide Answer' : 'Show Answer'}
+        </button>
+    </div>
+</div>
+</div>
+`;
+        answersContainer.appendChild(answerElement);
+    });
+}
+
+function markAsCorrect(answerId, buttonElement) {
+    fetch('/mark_correct', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            answer_id: answerId // The ID of the answer to mark as correct
+        })
+    })
+        .then(response => response.json())
+        .then(data => {
+            console.log(data); // Log the server response to inspect it
+            if (data.success) {
+                // Update the button text based on the new state
+                buttonElement.textContent = data.is_correct ? 'Mark as Incorrect' :
+                    'Mark as Correct';
+            } else {
+                Swal.fire({
+                    title: "Error",
+                    text: "Failed to mark answer.",
+                    icon: "error",
+                    confirmButtonText: "OK"
+                });
+            }
+        })
+        .catch(error => console.error('Error marking answer:', error));
+}
+
+// Add new question
+function addQuestion() {
+    const questionText = prompt("Enter the new question:");
+
+    if (questionText) {
+        fetch('/add_question', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ text: questionText })
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    Swal.fire({
+                        title: "Success",
+                        text: "Question added successfully!",
+                        icon: "success",
+                        confirmButtonText: "OK"
+                    });
+                    renderQuestions(); // Refresh the question list
+                }
+            })
+            .catch(error => console.error('Error adding question:', error));
+    }
+}
+
+// Add many questions at once, one per line, in a single request
+function addQuestions() {
+    Swal.fire({
+        title: "Add Questions",
+        input: "textarea",
+        inputPlaceholder: "One question per line",
+        showCancelButton: true,
+        confirmButtonText: "Add"
+    }).then(result => {
+        const texts = (result.value || '').split('\n')
+            .map(text => text.trim())
+            .filter(text => text);
+
+        if (!result.isConfirmed || texts.length === 0) return;
+
+        fetch('/bulk_operations', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                operations: texts.map(text => ({ op: 'add_question', text: text }))
+            })
+        })
+            .then(response => response.json())
+            .then(data => {
+                Swal.fire({
+                    title: data.success ? "Success" : "Error",
+                    text: data.success ? `${data.applied} questions added!` : data.message,
+                    icon: data.success ? "success" : "error",
+                    confirmButtonText: "OK"
+                });
+            })
+            .catch(error => console.error('Error adding questions:', error));
+    });
+}
+
+// Remove question
+function removeQuestion() {
+    const questionId = document.getElementById('questionSelect').value;
+
+    if (questionId) {
+        fetch('/remove_question', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ id: parseInt(questionId) })
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    Swal.fire({
+                        title: "Success",
+                        text: "Question removed successfully!",
+                        icon: "success",
+                        confirmButtonText: "OK"
+                    });
+                    renderQuestions(); // Refresh the question list
+                }
+            })
+            .catch(error => console.error('Error removing question:', error));
+    } else {
+        Swal.fire({
+            title: "Warning",
+            text: "Please select a question to remove.",
+            icon: "warning",
+            confirmButtonText: "OK"
+        });
+    }
+}
+
+// Clear votes and answers
+function clearData() {
+    if (confirm("Are you sure you want to clear all answers and votes? This action cannot be undone.")) {
+        fetch('/clear_data', {
+            method: 'POST'
+        })
+            .then(response => response.json())
+            .then(data => {
+                Swal.fire({
+                    title: "Cleared",
+                    text: "All votes and answers cleared.",
+                    icon: "info",
+                    confirmButtonText: "OK"
+                });
+                renderAnswers(); // Refresh the answers list after clearing
+            })
+            .catch(error => console.error('Error clearing data:', error));
+    }
+}
+
+function renderUsers() {
+    const data = adminSync && adminSync.state;
+    if (!data) return;
+    const usersContainer = document.getElementById('users');
+    usersContainer.innerHTML = ''; // Clear existing users
+
+    data.users.forEach(user => {
+        const userCard = document.createElement('div');
+        userCard.classList.add('col-sm-6', 'col-md-4', 'col-lg-3', 'mb-4');
+
+        userCard.innerHTML = `
+    <div class="card text-center shadow-sm">
+        <div class="card-body">
+            <img src="${user.avatar}" alt="${user.username}'s avatar"
+                 class="rounded-circle mb-3" style="width: 80px; height: 80px;">
+            <h5 class="card-title text-primary">${user.username}</h5>
+            <p class="card-text"><strong>Score:</strong> ${user.score}</p>
+            <button class="btn btn-success" onclick="changeScore('${user.username}', 1)">Increase Score</button>
+            <button class="btn btn-warning mt-2" onclick="changeScore('${user.username}', -1)">Decrease Score</button>
+            <button class="btn btn-danger mt-2" onclick="deleteUser('${user.username}')">Delete</button>
+        </div>
+    </div>
+`;
+        usersContainer.appendChild(userCard);
+    });
+}
+
+function deleteUser(username) {
+    // Send request to backend to delete the user
+    fetch('/delete_user', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ username: username }),
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                Swal.fire({
+                    icon: 'success',
+                    title: 'Success',
+                    text: 'User deleted successfully!',
+                }).then(() => {
+                    renderUsers(); // Refresh the user list after confirmation
+                });
+            } else {
+                Swal.fire({
+                    icon: 'error',
+                    title: 'Error',
+                    text: 'Error deleting user: ' + data.message,
+                });
+            }
+        })
+        .catch(error => {
+            console.error('Error deleting user:', error);
+            Swal.fire({
+                icon: 'error',
+                title: 'Error',
+                text: 'Error deleting user.',
+            });
+        });
+}
+
+
+function changeScore(username, increment) {
+    fetch('/change_score', { // This is the backend route where the score update will happen
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ username: username, increment: increment }),
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                renderUsers(); // Refresh the user list to reflect the new scores
+            } else {
+                Swal.fire({
+                    icon: 'error',
+                    title: 'Error',
+                    text: 'Failed to update score.',
+                });
+            }
+        })
+        .catch(error => console.error('Error changing score:', error));
+}
+
+
+// Render the state once it is loaded; later changes are pushed over the socket
+window.onload = () => {
+    adminSync = createGameStateSync(socket, function () {
+        renderQuestions();
+        renderAnswers();
+        renderUsers();
+    });
+};
@@ -0,0 +1,37 @@
+// static/js/admin_login.js
+
+// Admin login form.
+
+const form = document.getElementById("admin-login-form");
+form.addEventListener("submit", async (event) => {
+    event.preventDefault();
+
+    const formData = new FormData(form);
+    const response = await fetch(form.action, {
+        method: "POST",
+        body: formData
+    });
+
+    const result = await response.json();
+
+    if (result.success) {
+        // Show success SweetAlert and redirect
+        Swal.fire({
+            icon: 'success',
+            title: 'Login Successful',
+            text: 'Redirecting to admin panel...',
+            timer: 2000,
+            showConfirmButton: false
+        }).then(() => {
+            window.location.href = result.next;
+        });
+    } else {
+        // Show error SweetAlert
+        Swal.fire({
+            icon: 'error',
+            title: 'Login Failed',
+            text: result.error,
+            confirmButtonText: 'Try Again'
+        });
+    }
+});
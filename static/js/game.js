@@ -0,0 +1,463 @@
+// static/js/game.js
+
+// Game page. The template puts the player's name and avatar on <body>.
+
+var socket = wire.socket();
+
+// Answers and votes go over the open socket, which acknowledges each one with
+// the same result as the HTTP endpoint; while disconnected they are POSTed
+function sendAction(event, url, payload) {
+    if (socket.connected) {
+        return new Promise(resolve => socket.emit(event, payload, resolve));
+    }
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(payload)
+    }).then(response => response.json());
+}
+
+// Tells the player why the server refused an action, e.g. because the
+// answering or voting time is over; returns true if it was refused
+function showRefusal(data) {
+    if (data && data.success) return false;
+    Swal.fire({
+        title: "Oops!",
+        text: (data && data.message) || "Something went wrong, please try again.",
+        icon: "error"
+    });
+    return true;
+}
+
+var gameSync = null; // Local copy of the game state, see static/js/game_state.js
+var selectedAvatar = document.body.dataset.avatar;
+var userName = document.body.dataset.username; // Set from the Flask session by the template
+var userId = document.body.dataset.username; // Set from the Flask session by the template
+
+document.addEventListener("DOMContentLoaded", function () {
+    var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    var tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+});
+
+document.querySelectorAll('#avatarSelection img').forEach(function (img) {
+    img.addEventListener('click', function () {
+        document.querySelectorAll('#avatarSelection img').forEach(function (img) {
+            img.classList.remove('selected');
+        });
+        img.classList.add('selected');
+        selectedAvatar = img.getAttribute('data-avatar');
+    });
+});
+
+document.getElementById('revealVotes').addEventListener('click', function () {
+    fetch('/reveal_votes_admin', {
+        method: 'POST',
+    }).then(response => response.json())
+        .then(data => {
+            console.log('Votes revealed', data);
+            loadAnswers();
+        });
+});
+function renderUsers() {
+    const data = gameSync && gameSync.state;
+    if (!data) return;
+    const usersContainer = document.getElementById('users');
+    usersContainer.innerHTML = ''; // Clear existing users
+
+    data.users.forEach(user => {
+        const userCard = document.createElement('div');
+        userCard.classList.add('col-sm-6', 'col-md-2', 'col-lg-2', 'mb-4');
+
+        userCard.innerHTML = `
+    <div class="card text-center shadow-sm">
+        <div class="card-body">
+            <img src="${user.avatar}" alt="${user.username}'s avatar"
+                 class="rounded-circle mb-3" style="width: 50px; height: 50px;">
+            <p class="card-text"><strong>Score:</strong> ${user.score}</p>
+        </div>
+    </div>
+`;
+        usersContainer.appendChild(userCard);
+    });
+}
+function loadAnswers() {
+    fetch('/get_game_state')
+        .then(response => response.json())
+        .then(data => {
+            const answersList = document.getElementById('answers-list');
+            answersList.innerHTML = '';
+
+            const rowDiv = document.createElement('div');
+            rowDiv.classList.add('row');
+
+            let sortedAnswers = [...data.answers];
+            sortedAnswers.sort((a, b) => b.random_num - a.random_num);
+
+            sortedAnswers.forEach(answer => {
+                var answerDiv = document.createElement('div');
+                answerDiv.classList.add('col-md-12', 'card', 'mt-3');
+                answerDiv.innerHTML = `
+            <div class="card-body">
+                <!-- Avatar and name are hidden initially -->
+                <div class="answer-info" style="display: ${data.reveal ? 'block' : 'none'};">
+                    <img src="${answer.avatar}" alt="${answer.username}'s Avatar" class="rounded-circle" width="50" data-bs-toggle="tooltip" title="${answer.username}">
+                    <p class="card-text"><strong>${answer.username}</strong>: ${answer.text}</p>
+                </div>
+                <!-- Reveal button and vote button -->
+                <button class="btn btn-light vote-btn" data-answer-id="${answer.id}" ${data.reveal ? 'disabled' : ''}>Vote</button>
+                <div class="votes" id="votes-${answer.id}" style="display: ${data.reveal ? 'block' : 'none'};">
+                    Votes: ${answer.votes.join(', ')}
+                </div>
+            </div>
+        `;
+                rowDiv.appendChild(answerDiv);
+            });
+
+            answersList.appendChild(rowDiv);
+
+            var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+            var tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
+                return new bootstrap.Tooltip(tooltipTriggerEl);
+            });
+
+            if (data.reveal) {
+                sortedAnswers.forEach(answer => {
+                    const voteDiv = document.getElementById(`votes-${answer.id}`);
+                    voteDiv.innerHTML = `Votes: ${answer.votes.join(', ')}`;
+                    voteDiv.style.display = 'block';
+
+                    const answerCard = document.querySelector(`[data-answer-id="${answer.id}"]`)
+                        .closest('.card');
+                    const answerInfo = answerCard.querySelector('.answer-info');
+                    answerInfo.style.display = 'block';
+                });
+
+                const voteButtons = document.querySelectorAll('.vote-btn');
+                voteButtons.forEach(button => button.disabled = true);
+            }
+
+            document.querySelectorAll('.vote-btn').forEach(function (button) {
+                button.addEventListener('click', function () {
+                    if (!userName) {
+                        Swal.fire({
+                            title: "Oops!",
+                            text: "Please enter your name before voting!",
+                            icon: "warning"
+                        });
+                        return;
+                    }
+                    if (!selectedAvatar) {
+                        Swal.fire({
+                            title: "Oops!",
+                            text: "Please select an avatar before voting!",
+                            icon: "warning"
+                        });
+                        return;
+                    }
+
+                    const answerId = button.getAttribute('data-answer-id');
+                    sendAction('vote', '/vote', {
+                        answer_id: answerId,
+                        username: userName,
+                        avatar: selectedAvatar
+                    })
+                        .then(data => {
+                            console.log('Vote submitted', data);
+                            if (showRefusal(data)) return;
+                            Swal.fire({
+                                title: "Good job!",
+                                text: "Vote successful!",
+                                icon: "success"
+                            });
+                            loadAnswers();
+                        });
+                });
+            });
+        });
+}
+
+socket.on('next_question', function (data) {
+    document.getElementById('question-text').innerText = data.question.text;
+
+    document.getElementById('answerInput').value = '';
+    selectedAvatar = document.body.dataset.avatar;
+    document.getElementById('userName').disabled = false;
+    document.getElementById('submitAnswer').disabled = false;
+    document.querySelectorAll('#avatarSelection img').forEach(function (img) {
+        img.style.removeProperty('pointer-events');
+    });
+
+    document.querySelectorAll('#avatarSelection img').forEach(function (img) {
+        img.classList.remove('selected');
+    });
+
+    document.querySelectorAll('#avatarSelection img').forEach(function (img) {
+        img.classList.remove('selected');
+    });
+
+    localStorage.removeItem('hasVoted');
+
+    renderAnswersAndVotes();
+});
+
+
+window.onload = loadAnswers;
+
+function renderAnswersAndVotes() {
+    const data = gameSync && gameSync.state;
+    if (!data) return;
+    const answersList = document.getElementById('answers-list');
+    answersList.innerHTML = '';
+    answersList.style.display = 'flex';
+    answersList.style.flexWrap = 'wrap';
+
+    var userHasVoted = localStorage.getItem('hasVoted') === 'true';
+
+    let votesRevealed = data.reveal;
+
+    let sortedAnswers = [...data.answers];
+    sortedAnswers.sort((a, b) => b.random_num - a.random_num);
+
+    sortedAnswers.forEach(answer => {
+        if (!answer.visible) return;
+
+        var answerDiv = document.createElement('div');
+        answerDiv.classList.add('col-sm-12', 'col-md-12', 'col-12', 'col-lg-6', 'mb-4');
+
+        answerDiv.innerHTML = `
+    <div class="card text-center">
+    <div class="card-body">
+        <img src="${answer.avatar}" alt="${answer.username}'s Avatar" class="rounded-circle answer-avatar" width="50" style="display: none;" data-bs-toggle="tooltip" title="${answer.username}">
+        <p class="card-text answer-text"><strong class="answer-name" style="display: none;">${answer.username}</strong> ${answer.text}</p>
+        <button class="btn btn-light vote-btn" data-answer-id="${answer.id}" ${votesRevealed || userHasVoted || isClosed('voting') ? 'disabled' : ''}>Vote</button>
+        <div class="votes" id="votes-${answer.id}" style="display: ${votesRevealed ? 'block' : 'none'};">Votes: ${answer.votes.join(', ')}</div>
+    </div>
+    </div>
+
+`;
+        answersList.appendChild(answerDiv);
+
+        if (answer.is_correct) {
+            answerDiv.classList.add('correct-answer');
+        }
+
+        if (votesRevealed) {
+            const answerCard = answerDiv.querySelector('.card-body');
+            answerCard.querySelector('.answer-avatar').style.display = 'inline-block';
+            answerCard.querySelector('.answer-name').style.display = 'inline';
+
+            const voteDiv = document.getElementById(`votes-${answer.id}`);
+            voteDiv.style.display = 'block';
+            voteDiv.innerHTML = `Votes: ${answer.votes.map(vote => {
+                // Add the title attribute for the tooltip
+                return `<img src="${vote.avatar}" class="rounded-circle" width="30" alt="avatar" title="${vote.username}">`;
+            }).join(' ')}`;
+        }
+
+        document.querySelectorAll('.vote-btn').forEach(function (button) {
+            button.addEventListener('click', function () {
+                if (!userName) {
+                    Swal.fire({
+                        title: "Oops!",
+                        text: "Please enter your name before voting!",
+                        icon: "warning"
+                    });
+                    return;
+                }
+                if (!selectedAvatar) {
+                    Swal.fire({
+                        title: "Oops!",
+                        text: "Please select an avatar before voting!",
+                        icon: "warning"
+                    });
+                    return;
+                }
+
+                var answerId = button.getAttribute('data-answer-id');
+                sendAction('vote', '/vote', {
+                    answer_id: answerId,
+                    username: userName,
+                    avatar: selectedAvatar
+                })
+                    .then(data => {
+                        console.log('Vote submitted', data);
+                        if (showRefusal(data)) return;
+                        Swal.fire({
+                            title: "Good job!",
+                            text: "Vote successful!",
+                            icon: "success"
+                        });
+                        localStorage.setItem('hasVoted', 'true');
+                        renderAnswersAndVotes();
+                    });
+            });
+        });
+    });
+
+    if (data.canRevealVotes) {
+        document.getElementById('revealVotes').style.display = 'block';
+    }
+}
+
+socket.on('reveal_votes', function (data) {
+    if (data.reveal) {
+        data.answers.forEach(answer => {
+            const answerCard = document.getElementById('answer-' + answer.id);
+
+            answerCard.querySelector('.answer-text').textContent = answer.text;
+            answerCard.querySelector('.answer-avatar').src = answer.avatar;
+            answerCard.querySelector('.votes-list').textContent = 'Voted by: ' + (answer.votes
+                .length > 0 ? answer.votes.join(", ") : "No one");
+        });
+    }
+});
+
+socket.on('update_answers', function (data) {
+    data.answers.forEach(answer => {
+        const answerCard = document.getElementById('answer-' + answer.id);
+        if (answer.visible) {
+            answerCard.style.display = 'block';
+        } else {
+            answerCard.style.display = 'none';
+        }
+    });
+});
+document.getElementById('submitAnswer').addEventListener('click', function () {
+    userName = userName;
+    var answerText = document.getElementById('answerInput').value;
+
+    // Answer the question currently on screen; the server falls back to its current question
+    var questionId = gameSync && gameSync.state && gameSync.state.current_question
+        ? gameSync.state.current_question.id : null;
+
+    if (!userName) {
+        Swal.fire({
+            title: "Oops!",
+            text: "Please enter your name!",
+            icon: "warning",
+            confirmButtonText: "OK"
+        });
+        return;
+    }
+    if (!selectedAvatar) {
+        Swal.fire({
+            title: "Oops!",
+            text: "Please select an avatar!",
+            icon: "warning",
+            confirmButtonText: "OK"
+        });
+        return;
+    }
+
+    sendAction('submit_answer', '/submit_answer', {
+        answer: answerText,
+        username: userId,
+        question_id: questionId,
+        avatar: selectedAvatar
+    })
+        .then(data => {
+            console.log('Answer submitted', data);
+            if (showRefusal(data)) return;
+            Swal.fire({
+                title: "Good job!",
+                text: "Answer submitted!",
+                icon: "success"
+            });
+            document.getElementById('userName').disabled = true;
+            document.getElementById('avatarSelection').querySelectorAll('img').forEach(img => {
+                img.style.pointerEvents = 'none';
+            });
+
+            document.getElementById('submitAnswer').disabled = true;
+        });
+});
+
+function handleVoteButtonClick(answerId) {
+    sendAction('vote', '/vote', {
+        answer_id: answerId,
+        username: userName,
+        avatar: selectedAvatar
+    })
+        .then(data => {
+            if (showRefusal(data)) return;
+            Swal.fire({
+                title: "Good job!",
+                text: "You voted for answer ID: " + answerId,
+                icon: "success"
+            });
+
+            document.querySelector(`[data-answer-id="${answerId}"]`).disabled = true;
+        });
+}
+
+function addVoteListeners() {
+    document.querySelectorAll('.vote-btn').forEach(function (button) {
+        button.addEventListener('click', function () {
+            var answerId = button.getAttribute('data-answer-id');
+            handleVoteButtonClick(answerId);
+        });
+    });
+}
+
+addVoteListeners();
+
+// Timed rounds: the phase of the current question, if the round is timed
+function currentPhase() {
+    const data = gameSync && gameSync.state;
+    if (!data || !data.phase || !data.current_question) return null;
+    return data.phase.question_id === data.current_question.id ? data.phase : null;
+}
+
+// Whether a timed round is past the given phase ('answering' or 'voting')
+// or has not reached it yet; the server has the final say
+function isClosed(name) {
+    const phase = currentPhase();
+    return phase !== null && phase.name !== name;
+}
+
+const PHASE_LABELS = { answering: 'Answering', voting: 'Voting', reveal: 'Results' };
+
+function renderPhase() {
+    const phase = currentPhase();
+    const status = document.getElementById('phase-status');
+    status.hidden = phase === null;
+    if (phase === null) return;
+
+    let text = PHASE_LABELS[phase.name];
+    if (phase.deadline) {
+        const secondsLeft = Math.max(0, Math.ceil(phase.deadline - Date.now() / 1000));
+        text += ' \u00b7 ' + secondsLeft + 's';
+    }
+    status.textContent = text;
+    if (isClosed('answering')) {
+        document.getElementById('submitAnswer').disabled = true;
+    }
+}
+
+// Counts the time left down; the phase itself only changes when the server says so
+setInterval(renderPhase, 1000);
+
+function renderCurrentQuestion() {
+    const data = gameSync && gameSync.state;
+    if (!data) return;
+    if (data.current_question) {
+        document.getElementById('question-text').innerText = data.current_question.text;
+    } else {
+        document.getElementById('question-text').innerText = "No question selected.";
+    }
+}
+
+window.onload = function () {
+    localStorage.removeItem('hasVoted');
+    // Render the state once it is loaded; later changes are pushed over the socket
+    gameSync = createGameStateSync(socket, function () {
+        renderCurrentQuestion();
+        renderPhase();
+        renderUsers();
+        renderAnswersAndVotes();
+    });
+};
@@ -0,0 +1,180 @@
+// static/js/game_state.js
+
+// Keeps a local copy of the game state in sync with the server.
+// The state only holds the answers of one round: state.question_id, which is
+// the current question unless the page asked for another one.
+// The full state is fetched once from /get_game_state; after that the server
+// pushes 'state_delta' events which are applied in place. If a delta does not
+// follow on from the local version (missed events, reconnect), the gap is
+// filled from /get_changes, or the full state is fetched again.
+// Needs static/js/wire.js, which picks the wire format.
+function createGameStateSync(socket, onChange, questionId) {
+    const sync = {
+        state: null,
+        reload: reload
+    };
+
+    function scope() {
+        return questionId !== undefined ? '?question_id=' + questionId : '';
+    }
+
+    function reload() {
+        return wire.fetchJSON('/get_game_state' + scope())
+            .then(data => {
+                sync.state = data;
+                onChange(sync.state);
+            })
+            .catch(error => console.error('Error fetching game state:', error));
+    }
+
+    function catchUp() {
+        if (!sync.state) {
+            return reload();
+        }
+        const questionParam = sync.state.question_id !== null ? '&question_id=' + sync.state.question_id : '';
+        return wire.fetchJSON('/get_changes?since=' + sync.state.version + questionParam)
+            .then(data => {
+                if (data.reset || !applyChanges(data.changes)) {
+                    return reload();
+                }
+                // Changes about other questions were left out
+                sync.state.version = data.version;
+                onChange(sync.state);
+            })
+            .catch(error => console.error('Error fetching changes:', error));
+    }
+
+    function findAnswer(answerId) {
+        return sync.state.answers.find(answer => answer.id === answerId);
+    }
+
+    function findUser(username) {
+        return sync.state.users.find(user => user.username === username);
+    }
+
+    // Applies one change; returns false if the change needs a full reload
+    function applyChange(change) {
+        const state = sync.state;
+        const answer = change.answer_id !== undefined ? findAnswer(change.answer_id) : null;
+
+        switch (change.type) {
+            case 'answer_added':
+                if ((state.question_id === null || change.answer.question_id === state.question_id)
+                        && !findAnswer(change.answer.id)) {
+                    state.answers.push(change.answer);
+                }
+                break;
+            case 'vote_added':
+                if (answer && !answer.votes.some(vote => vote.username === change.vote.username)) {
+                    answer.votes.push(change.vote);
+                }
+                break;
+            case 'visibility_changed':
+                if (answer) answer.visible = change.visible;
+                break;
+            case 'correct_changed':
+                if (answer) answer.is_correct = change.is_correct;
+                break;
+            case 'votes_cleared':
+                state.answers.forEach(answer => answer.votes = []);
+                break;
+            case 'votes_revealed':
+                state.reveal = true;
+                // Revealing ends a timed round early too
+                if (state.phase && state.phase.question_id === state.question_id) {
+                    state.phase = Object.assign({}, state.phase, { name: 'reveal', deadline: null });
+                }
+                Object.entries(change.scores).forEach(([username, score]) => {
+                    const user = findUser(username);
+                    if (user) user.score = score;
+                });
+                break;
+            case 'user_added':
+                if (!findUser(change.user.username)) state.users.push(change.user);
+                break;
+            case 'user_removed':
+                state.users = state.users.filter(user => user.username !== change.username);
+                break;
+            case 'score_changed': {
+                const user = findUser(change.username);
+                if (user) user.score = change.score;
+                break;
+            }
+            case 'question_added':
+                state.questions.push(change.question);
+                break;
+            case 'question_removed':
+                state.questions = state.questions.filter(question => question.id !== change.id);
+                break;
+            case 'question_changed':
+                if (questionId === undefined) {
+                    // Following the current question; fetch the new round's answers
+                    return false;
+                }
+                state.current_question = change.question;
+                state.phase = null;
+                break;
+            case 'phase_changed':
+                state.phase = change.phase;
+                if (change.phase.name === 'voting') {
+                    // Opening the vote shows every answer of the round
+                    state.answers.forEach(answer => {
+                        if (answer.question_id === change.phase.question_id) answer.visible = true;
+                    });
+                }
+                break;
+            default:
+                return false;
+        }
+        state.version = change.version;
+        return true;
+    }
+
+    function applyChanges(changes) {
+        for (const change of changes) {
+            if (change.version <= sync.state.version) continue;
+            if (!applyChange(change)) return false;
+        }
+        return true;
+    }
+
+    socket.on('state_delta', function (delta) {
+        if (!sync.state) return;
+        if (delta.version <= sync.state.version) return;
+        if (delta.from !== sync.state.version) {
+            catchUp();
+            return;
+        }
+        if (!applyChanges(delta.changes)) {
+            reload();
+            return;
+        }
+        sync.state.version = delta.version;
+        onChange(sync.state);
+    });
+
+    // Changes about the watched question while it is not the current one.
+    // They are not part of the version sequence, so they are applied as they come
+    socket.on('question_delta', function (delta) {
+        if (!sync.state || delta.question_id !== sync.state.question_id) return;
+        const version = sync.state.version;
+        const applied = delta.changes.every(applyChange);
+        sync.state.version = version;
+        if (!applied) {
+            reload();
+            return;
+        }
+        onChange(sync.state);
+    });
+
+    // After a reconnect, fetch whatever was missed while disconnected
+    socket.on('connect', function () {
+        if (questionId !== undefined) {
+            socket.emit('watch_question', { question_id: questionId });
+        }
+        if (sync.state) catchUp();
+    });
+
+    reload();
+    return sync;
+}
@@ -0,0 +1,27 @@
+// static/js/login.js
+
+// Player login form.
+
+document.getElementById("loginForm").addEventListener("submit", function (e) {
+    e.preventDefault();
+
+    const password = document.querySelector("input[name='password']").value;
+
+    fetch('/login', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+        body: new URLSearchParams({ password: password })
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                Swal.fire({
+                    title: "Try again",
+                    text: `Oops... ${data.error}`,
+                    icon: "error"
+                });
+            } else {
+                window.location.href = data.next;
+            }
+        });
+});
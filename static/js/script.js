@@ -10,15 +10,8 @@ function submitAnswer() {
     const questionId = 1;      // Example question ID
     const avatar = 'avatar1';  // Example avatar, you can replace this dynamically with selected avatar
 
-    fetch('/submit_answer', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ answer, user_id: userId, question_id: questionId, avatar })
-    })
-    .then(response => response.json())
-    .then(data => {
+    // Sent over the socket; the server acknowledges with the result
+    socket.emit('submit_answer', { answer, user_id: userId, question_id: questionId, avatar }, (data) => {
         if (data.success) {
             // Answer is successfully submitted; no need to reload, as it's handled in real-time
         }
@@ -29,15 +22,7 @@ function submitAnswer() {
 function voteAnswer(answerId) {
     const userId = 'user456';  // Example user ID, you may want to dynamically assign this
 
-    fetch('/vote', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({ answer_id: answerId, user_id: userId })
-    })
-    .then(response => response.json())
-    .then(data => {
+    socket.emit('vote', { answer_id: answerId, user_id: userId }, (data) => {
         if (data.success) {
             alert("Vote submitted successfully!");
         }
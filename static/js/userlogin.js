@@ -0,0 +1,59 @@
+// static/js/userlogin.js
+
+// Player name and avatar form.
+
+let selectedAvatar = '';
+
+// Handle avatar selection
+document.querySelectorAll('.avatar').forEach(function (avatar) {
+    avatar.addEventListener('click', function () {
+        // Deselect all avatars
+        document.querySelectorAll('.avatar').forEach(function (img) {
+            img.classList.remove('selected');
+        });
+
+        // Select the clicked avatar
+        avatar.classList.add('selected');
+        selectedAvatar = avatar.getAttribute('data-avatar');
+    });
+});
+
+// Form submission
+document.getElementById("usernameForm").addEventListener("submit", function (e) {
+    e.preventDefault();
+
+    const username = document.querySelector("input[name='username']").value;
+
+    if (!selectedAvatar) {
+        Swal.fire({
+            title: "Please select an avatar",
+            icon: "error"
+        });
+        return;
+    }
+
+    fetch('/userlogin', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+        body: new URLSearchParams({ username: username, avatar: selectedAvatar })
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                Swal.fire({
+                    title: "Try again",
+                    text: `Oops... ${data.error}`,
+                    icon: "error"
+                });
+            } else {
+                window.location.href = data.next;
+            }
+        })
+        .catch(error => {
+            Swal.fire({
+                title: "Error",
+                text: `Something went wrong: ${error}`,
+                icon: "error"
+            });
+        });
+});
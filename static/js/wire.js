@@ -0,0 +1,93 @@
+// static/js/wire.js
+
+// Compact wire format for slow networks (see wire.py). Opening a page with
+// ?wire=compact switches the browser tab over to it; ?wire=json switches back.
+// Pages create their socket with wire.socket() and fetch JSON with
+// wire.fetchJSON(); either way they get the usual documents.
+const wire = (function () {
+    const MEDIA_TYPE = 'application/vnd.quiz.compact+json';
+    const AVATAR_PREFIX = '/static/avatars/';
+    const KEYS = {
+        u: 'username',
+        a: 'avatar',
+        r: 'random_num',
+        v: 'visible',
+        vs: 'votes',
+        c: 'is_correct',
+        q: 'question_id',
+        ai: 'answer_id',
+        t: 'text',
+        s: 'score',
+        n: 'version'
+    };
+    // Maps keyed by user names or question IDs; their keys are data, not names
+    const VERBATIM = ['scores', 'points', 'round_points'];
+
+    const requested = new URLSearchParams(window.location.search).get('wire');
+    if (requested) {
+        sessionStorage.setItem('wire', requested);
+    }
+    const compact = sessionStorage.getItem('wire') === 'compact';
+
+    function expand(value) {
+        if (Array.isArray(value)) {
+            return value.map(expand);
+        }
+        if (value === null || typeof value !== 'object') {
+            return value;
+        }
+        const result = {};
+        Object.entries(value).forEach(([key, item]) => {
+            const name = KEYS[key] || key;
+            if (VERBATIM.includes(name)) {
+                result[name] = item;
+            } else if (name === 'avatar' && typeof item === 'string' && item.startsWith('~')) {
+                result[name] = AVATAR_PREFIX + item.slice(1);
+            } else {
+                result[name] = expand(item);
+            }
+        });
+        return result;
+    }
+
+    // Connections refused for coming too fast are tried again once the server allows
+    function retryRefused(socket) {
+        socket.on('connect_error', error => {
+            if (error.data && error.data.retry_after) {
+                setTimeout(() => socket.connect(), error.data.retry_after * 1000);
+            }
+        });
+        return socket;
+    }
+
+    function socket() {
+        if (!compact) {
+            return retryRefused(io());
+        }
+        const socket = retryRefused(io({ query: { wire: 'compact' } }));
+        // Every handler gets its arguments expanded
+        const on = socket.on.bind(socket);
+        socket.on = (event, handler) => on(event, (...args) => handler(...args.map(expand)));
+        return socket;
+    }
+
+    // Waits for as long as a 429 response asks, then tries again
+    function retryLater(response, again) {
+        const seconds = Number(response.headers.get('Retry-After')) || 1;
+        return new Promise(resolve => setTimeout(resolve, seconds * 1000)).then(again);
+    }
+
+    function fetchJSON(url, options) {
+        const again = () => fetchJSON(url, options);
+        if (!compact) {
+            return fetch(url, options)
+                .then(response => response.status === 429 ? retryLater(response, again) : response.json());
+        }
+        options = options || {};
+        const headers = Object.assign({ 'Accept': MEDIA_TYPE }, options.headers);
+        return fetch(url, Object.assign({}, options, { headers: headers }))
+            .then(response => response.status === 429 ? retryLater(response, again) : response.json().then(expand));
+    }
+
+    return { compact: compact, expand: expand, socket: socket, fetchJSON: fetchJSON };
+})();
@@ -0,0 +1,576 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BYTES_WRITTEN = metrics.counter('quiz_storage_bytes_written_total',
+                                'Bytes written by the storage backends (SQLite writes not included)', ['kind'])
+
+
+def empty_data():
+    """Returns the layout of a brand new game_data.json."""
+    return {"questions": [], "answers": [], "votes": [], "users": []}
+
+
+def fsync_dir(path):
+    """Makes the renames and deletions inside the directory of ``path`` durable."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonStorage:
+    """Stores the whole game as one game_data.json document.
+
+    This is the original on-disk format. Every flush rewrites the file, so
+    individual events are not recorded.
+    """
+
+    # Whether GameState should write periodic snapshots of the document
+    snapshots = True
+    # Whether writes are forced to disk before they count as done
+    fsync = False
+    # Whether snapshots are, whatever ``fsync`` says
+    sync_snapshots = False
+
+    def __init__(self, path='game_data.json', backup_path='game_data.backup.json'):
+        self.path = path
+        self.backup_path = backup_path
+
+    def load(self):
+        """Returns the saved document and the events logged after it."""
+        return self._read_snapshot(), []
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return empty_data()
+        except (IOError, json.JSONDecodeError) as e:
+            logger.error(f"File operation error: {str(e)}")
+            return empty_data()
+
+    def append(self, events, data):
+        """Records a batch of events after they were applied to ``data``. Snapshots cover them here."""
+
+    def begin_snapshot(self):
+        """Called under the state lock right before a snapshot is serialized."""
+
+    def write_snapshot(self, payload):
+        """Atomically replaces game_data.json, keeping the previous copy as a backup."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+            if self.fsync or self.sync_snapshots:
+                f.flush()
+                os.fsync(f.fileno())
+        BYTES_WRITTEN.labels('snapshot').inc(os.path.getsize(tmp_path))
+        if os.path.exists(self.path):
+            shutil.copyfile(self.path, self.backup_path)
+        os.replace(tmp_path, self.path)
+        if self.fsync or self.sync_snapshots:
+            fsync_dir(self.path)
+
+    def end_snapshot(self):
+        """Called once the snapshot is safely on disk."""
+
+    def close(self):
+        pass
+
+
+class WalStorage(JsonStorage):
+    """Appends every event to a log and snapshots into game_data.json now and then.
+
+    A vote becomes one short line appended to ``<data file>.wal`` instead of a
+    full rewrite of the document. On startup the snapshot is loaded and every
+    logged event newer than its ``version`` is replayed on top of it.
+
+    When a snapshot starts, the live log is renamed to ``.wal.1`` and a fresh
+    log is opened, so events keep flowing while the snapshot is written. The
+    old segment is deleted once the snapshot is on disk.
+    """
+
+    # The log segment a snapshot covers is deleted right after it, so the
+    # snapshot must be on disk first; a few fsyncs every snapshot interval
+    sync_snapshots = True
+
+    def __init__(self, path='game_data.json', backup_path='game_data.backup.json',
+                 log_path=None, fsync=False):
+        super().__init__(path, backup_path)
+        self.log_path = log_path or os.path.splitext(path)[0] + '.wal'
+        self.old_log_path = self.log_path + '.1'
+        self.fsync = fsync
+        self._log = None
+
+    def load(self):
+        data = self._read_snapshot()
+        events = []
+        for path in (self.old_log_path, self.log_path):
+            events.extend(self._read_log(path))
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        return data, events
+
+    def _read_log(self, path):
+        if not os.path.exists(path):
+            return []
+        events = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-append; nothing after it was acknowledged
+                    logger.warning(f"Ignoring unreadable log record {path}:{line_number}")
+                    break
+        return events
+
+    def append(self, events, data):
+        lines = ''.join(
+            json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n' for event in events)
+        self._log.write(lines)
+        self._log.flush()
+        BYTES_WRITTEN.labels('log').inc(len(lines.encode('utf-8')))
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def begin_snapshot(self):
+        self._log.close()
+        if os.path.exists(self.old_log_path):
+            # A previous snapshot failed; keep its events ahead of the current ones
+            with open(self.old_log_path, 'a', encoding='utf-8') as old, \
+                    open(self.log_path, 'r', encoding='utf-8') as current:
+                shutil.copyfileobj(current, old)
+            os.remove(self.log_path)
+        else:
+            os.replace(self.log_path, self.old_log_path)
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+
+    def end_snapshot(self):
+        # write_snapshot() always syncs the snapshot, so the events it covers
+        # can go. Should the deletion itself be lost, replay skips them anyway
+        if os.path.exists(self.old_log_path):
+            os.remove(self.old_log_path)
+            if self.fsync:
+                fsync_dir(self.old_log_path)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    avatar TEXT,
+    score INTEGER
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER NOT NULL,
+    question_id INTEGER,
+    text TEXT,
+    username TEXT,
+    avatar TEXT,
+    random_num INTEGER,
+    visible INTEGER NOT NULL DEFAULT 0,
+    is_correct INTEGER,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS votes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    answer_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    avatar TEXT,
+    UNIQUE (answer_id, username)
+);
+CREATE INDEX IF NOT EXISTS idx_answers_id ON answers (id);
+CREATE INDEX IF NOT EXISTS idx_answers_question_id ON answers (question_id);
+CREATE INDEX IF NOT EXISTS idx_votes_username ON votes (username);
+"""
+
+# Answer fields that have their own column; anything else goes into 'extra'
+ANSWER_COLUMNS = ('id', 'question_id', 'text', 'username', 'avatar', 'random_num',
+                  'visible', 'is_correct', 'votes')
+
+
+class SqliteStorage:
+    """Keeps users, questions, answers and votes in indexed SQLite tables.
+
+    Each event is written as a small transaction touching only the rows it
+    changed, so nothing ever rewrites the whole game. The database runs in
+    WAL mode and is the durable copy; game_data.json is only read once to
+    seed an empty database.
+    """
+
+    snapshots = False
+
+    def __init__(self, db_path='game_data.db', json_path='game_data.json'):
+        self.db_path = db_path
+        self.json_path = json_path
+        # Every call is serialized by the GameState lock
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SQLITE_SCHEMA)
+
+    def load(self):
+        if self._get_meta('version') is None and os.path.exists(self.json_path):
+            logger.info(f"Importing {self.json_path} into {self.db_path}")
+            self.write_all(JsonStorage(self.json_path)._read_snapshot())
+        return self.read_all(), []
+
+    def read_all(self):
+        """Rebuilds the game_data.json document from the tables."""
+        data = {
+            "questions": [{"id": row[0], "text": row[1]} for row in
+                          self.db.execute('SELECT id, text FROM questions ORDER BY rowid')],
+            "answers": [],
+            "votes": json.loads(self._get_meta('votes') or '[]'),
+            "users": [{"username": row[0], "avatar": row[1], "score": row[2]} for row in
+                      self.db.execute('SELECT username, avatar, score FROM users ORDER BY rowid')],
+        }
+        votes = {}
+        for answer_id, username, avatar in self.db.execute(
+                'SELECT answer_id, username, avatar FROM votes ORDER BY seq'):
+            votes.setdefault(answer_id, []).append({"username": username, "avatar": avatar})
+        for row in self.db.execute(
+                'SELECT id, question_id, text, username, avatar, random_num, visible, is_correct, extra '
+                'FROM answers ORDER BY seq'):
+            answer = {
+                "id": row[0],
+                "question_id": row[1],
+                "text": row[2],
+                "username": row[3],
+                "avatar": row[4],
+                "votes": votes.get(row[0], []),
+                "random_num": row[5],
+                "visible": bool(row[6])
+            }
+            if row[7] is not None:
+                answer['is_correct'] = bool(row[7])
+            if row[8]:
+                answer.update(json.loads(row[8]))
+            data['answers'].append(answer)
+        for key in ('reveal', 'current_question', 'phase', 'round_points', 'version', 'last_answer_id'):
+            value = self._get_meta(key)
+            if value is not None:
+                data[key] = json.loads(value)
+        return data
+
+    def write_all(self, data):
+        """Replaces every table with the contents of a game_data.json document."""
+        with self.db:
+            self.db.execute('DELETE FROM users')
+            self.db.execute('DELETE FROM questions')
+            self.db.execute('DELETE FROM answers')
+            self.db.execute('DELETE FROM votes')
+            self.db.executemany(
+                'INSERT OR REPLACE INTO users (username, avatar, score) VALUES (?, ?, ?)',
+                [(u['username'], u.get('avatar'), u.get('score')) for u in data.get('users', [])])
+            self.db.executemany(
+                'INSERT OR REPLACE INTO questions (id, text) VALUES (?, ?)',
+                [(q['id'], q['text']) for q in data.get('questions', [])])
+            for answer in data.get('answers', []):
+                self._insert_answer(answer)
+            for key in ('reveal', 'current_question', 'phase', 'round_points', 'votes', 'version',
+                        'last_answer_id'):
+                if key in data:
+                    self._set_meta(key, data[key])
+                else:
+                    self.db.execute('DELETE FROM meta WHERE key = ?', (key,))
+            self._set_meta('version', data.get('version', 0))
+
+    def _insert_answer(self, answer):
+        extra = {k: v for k, v in answer.items() if k not in ANSWER_COLUMNS}
+        is_correct = answer.get('is_correct')
+        self.db.execute(
+            'INSERT INTO answers (id, question_id, text, username, avatar, random_num, visible, '
+            'is_correct, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (answer['id'], answer.get('question_id'), answer.get('text'), answer.get('username'),
+             answer.get('avatar'), answer.get('random_num'), int(bool(answer.get('visible'))),
+             None if is_correct is None else int(bool(is_correct)),
+             json.dumps(extra, ensure_ascii=False) if extra else None))
+        self.db.executemany(
+            'INSERT OR IGNORE INTO votes (answer_id, username, avatar) VALUES (?, ?, ?)',
+            [(answer['id'], v['username'], v.get('avatar')) for v in answer.get('votes', [])])
+
+    def _get_meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                        (key, json.dumps(value, ensure_ascii=False)))
+
+    def append(self, events, data):
+        writers = [getattr(self, '_write_' + event['type'], None) for event in events]
+        if None in writers:
+            # Unknown to the schema; rewriting everything covers the whole batch
+            self.write_all(data)
+            return
+        with self.db:
+            for writer, event in zip(writers, events):
+                writer(event, data)
+            self._set_meta('version', data['version'])
+            self._set_meta('last_answer_id', data.get('last_answer_id', 0))
+
+    def _write_user_joined(self, event, data):
+        self.db.execute('INSERT OR IGNORE INTO users (username, avatar, score) VALUES (?, ?, 0)',
+                        (event['username'], event['avatar']))
+
+    def _write_user_deleted(self, event, data):
+        self.db.execute('DELETE FROM users WHERE username = ?', (event['username'],))
+
+    def _write_score_changed(self, event, data):
+        self.db.execute('UPDATE users SET score = COALESCE(score, 0) + ? WHERE username = ?',
+                        (event['delta'], event['username']))
+
+    def _write_answer_submitted(self, event, data):
+        self._insert_answer({
+            "id": event['id'],
+            "question_id": event['question_id'],
+            "text": event['text'],
+            "username": event['username'],
+            "avatar": event['avatar'],
+            "random_num": event['random_num'],
+            "visible": False
+        })
+
+    def _write_vote_cast(self, event, data):
+        self.db.execute('INSERT OR IGNORE INTO votes (answer_id, username, avatar) VALUES (?, ?, ?)',
+                        (event['answer_id'], event['username'], event['avatar']))
+
+    def _write_answer_visibility_toggled(self, event, data):
+        self.db.execute('UPDATE answers SET visible = 1 - visible WHERE id = ?', (event['answer_id'],))
+
+    def _write_answer_correct_toggled(self, event, data):
+        self.db.execute('UPDATE answers SET is_correct = 1 - COALESCE(is_correct, 0) WHERE id = ?',
+                        (event['answer_id'],))
+
+    def _write_question_added(self, event, data):
+        self.db.execute('INSERT OR REPLACE INTO questions (id, text) VALUES (?, ?)',
+                        (event['id'], event['text']))
+
+    def _write_game_imported(self, event, data):
+        self.db.execute('DELETE FROM users')
+        self.db.execute('DELETE FROM questions')
+        self.db.execute('DELETE FROM answers')
+        self.db.execute('DELETE FROM votes')
+        for key in ('reveal', 'current_question', 'round_points'):
+            self._set_meta(key, event[key])
+        self.db.execute("DELETE FROM meta WHERE key = 'phase'")
+
+    def _write_records_imported(self, event, data):
+        # The event only lists the records that were added
+        self.db.executemany(
+            'INSERT OR IGNORE INTO users (username, avatar, score) VALUES (?, ?, ?)',
+            [(u['username'], u.get('avatar'), u.get('score')) for u in event['users']])
+        self.db.executemany(
+            'INSERT OR REPLACE INTO questions (id, text) VALUES (?, ?)',
+            [(q['id'], q['text']) for q in event['questions']])
+        for answer in event['answers']:
+            self._insert_answer(answer)
+
+    def _write_question_removed(self, event, data):
+        self.db.execute('DELETE FROM questions WHERE id = ?', (event['id'],))
+
+    def _write_current_question_set(self, event, data):
+        self._set_meta('current_question', event['question'])
+        self.db.execute("DELETE FROM meta WHERE key = 'phase'")
+        # The rounds of the other questions went to the archive
+        question_id = event['question'].get('id')
+        self.db.execute('DELETE FROM votes WHERE answer_id IN '
+                        '(SELECT id FROM answers WHERE question_id IS NOT ?)', (question_id,))
+        self.db.execute('DELETE FROM answers WHERE question_id IS NOT ?', (question_id,))
+        self._set_meta('round_points', data.get('round_points', {}))
+
+    def _write_phase_started(self, event, data):
+        phase = data.get('phase')
+        if phase is None:
+            # A later event of the batch moved on to another question
+            return
+        self._set_meta('phase', phase)
+        if event['phase'] == 'voting':
+            self.db.execute('UPDATE answers SET visible = 1 WHERE question_id = ?', (phase['question_id'],))
+
+    def _write_votes_cleared(self, event, data):
+        self.db.execute('DELETE FROM votes')
+
+    def _write_votes_revealed(self, event, data):
+        self._set_meta('reveal', data.get('reveal', False))
+        self._set_meta('round_points', data['round_points'])
+        if 'phase' in data:
+            self._set_meta('phase', data['phase'])
+        # Only the round's scorers changed, and only the first time it is revealed
+        self.db.executemany('UPDATE users SET score = COALESCE(score, 0) + ? WHERE username = ?',
+                            [(earned, username) for username, earned in event.get('awarded', {}).items()])
+
+    def begin_snapshot(self):
+        pass
+
+    def write_snapshot(self, payload):
+        pass
+
+    def end_snapshot(self):
+        pass
+
+    def close(self):
+        self.db.close()
+
+
+class RoundArchive:
+    """Completed rounds, appended to a file as one JSON document per line.
+
+    Each record holds a round's question, its answers with their votes, the
+    points it awarded and the ``seq`` of the event that ended it. Records are
+    only ever appended while the server runs; those newer than the saved
+    state (written just before a crash) are cut off again by
+    ``discard_after()`` on startup. Several processes may read the file
+    while one appends to it: a line only counts once it is complete.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.last_seq = 0
+        self._offsets = []  # where each record starts
+        self._size = 0  # bytes of complete lines indexed so far
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        """Indexes the records added since the last call; called with the lock held."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._size:
+            # Cut off on startup by another process
+            self._offsets, self._size, self.last_seq = [], 0, 0
+        if size == self._size:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._size)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Still being written, or torn by a crash
+                    break
+                self._offsets.append(self._size)
+                self._size += len(line)
+                self.last_seq = json.loads(line)['seq']
+
+    def append(self, records):
+        """Appends records, skipping those already archived (events replayed on startup)."""
+        with self._lock:
+            self._scan()
+            lines = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+                            for record in records if record['seq'] > self.last_seq).encode('utf-8')
+            if not lines:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'ab') as f:
+                # Drop a torn line left by a crash first
+                f.truncate(self._size)
+                f.write(lines)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            BYTES_WRITTEN.labels('archive').inc(len(lines))
+
+    def discard_after(self, seq):
+        """Removes the records of events after ``seq``, which the saved state does not include."""
+        with self._lock:
+            self._scan()
+            if not os.path.exists(self.path):
+                return
+            keep = len(self._offsets)
+            while keep and self._seq_at(keep - 1) > seq:
+                keep -= 1
+            size = self._offsets[keep] if keep < len(self._offsets) else self._size
+            if size == os.path.getsize(self.path):
+                return
+            logger.warning(f"Discarding {len(self._offsets) - keep} unsaved rounds from {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+            self._offsets, self._size, self.last_seq = [], 0, 0
+            self._scan()
+
+    def _seq_at(self, index):
+        return self._read(index)['seq']
+
+    def _read(self, index):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[index])
+            return json.loads(f.readline())
+
+    def records(self):
+        """Yields every archived record, oldest first, reading one line at a time."""
+        with self._lock:
+            self._scan()
+            end = self._size
+        if not end:
+            return
+        with open(self.path, 'rb') as f:
+            while f.tell() < end:
+                yield json.loads(f.readline())
+
+    def page(self, offset=0, limit=10):
+        """Returns ``(rounds, total)``: a page of the archived rounds, newest first.
+
+        Each round is its record plus ``round``, its number counting from 1.
+        """
+        with self._lock:
+            self._scan()
+            total = len(self._offsets)
+            indexes = range(total - 1 - offset, max(total - 1 - offset - limit, -1), -1)
+            return [dict(self._read(index), round=index + 1) for index in indexes], total
+
+
+def import_json(json_path, db_path):
+    """One-shot import of an existing game_data.json into a SQLite database."""
+    storage = SqliteStorage(db_path, json_path)
+    try:
+        storage.write_all(JsonStorage(json_path)._read_snapshot())
+    finally:
+        storage.close()
+
+
+def create_storage(kind, path, backup_path, **options):
+    """Builds the storage backend selected by the DATA_STORAGE setting."""
+    if kind == 'json':
+        return JsonStorage(path, backup_path)
+    if kind == 'wal':
+        return WalStorage(path, backup_path, fsync=options.get('fsync', False))
+    if kind == 'sqlite':
+        return SqliteStorage(options.get('db_path') or os.path.splitext(path)[0] + '.db', path)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import game_data.json into a SQLite database.')
+    parser.add_argument('json_path', nargs='?', default='game_data.json')
+    parser.add_argument('db_path', nargs='?', default='game_data.db')
+    args = parser.parse_args()
+    import_json(args.json_path, args.db_path)
+    print(f"Imported {args.json_path} into {args.db_path}")
@@ -0,0 +1,28 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def quiz_app(tmp_path_factory):
+    """The app module, with its data, rooms and static build in a scratch directory."""
+    directory = tmp_path_factory.mktemp('quiz')
+    os.environ.update(
+        ADMIN_PASSWORD='admin', USER_PASSWORD='user', SESSION_COOKIE_SECURE='false',
+        GAME_DATA_FILE=str(directory / 'game_data.json'), ROOMS_DIR=str(directory / 'rooms'),
+        STATIC_BUILD_DIR=str(directory / 'static'), PROFILE_DIR=str(directory / 'profiles'),
+        DATA_STORAGE='json', WORKERS='1')
+    app = importlib.import_module('app')
+    yield app
+    app.rooms.stop()
+
+
+@pytest.fixture
+def admin(quiz_app):
+    client = quiz_app.app.test_client()
+    client.post('/admin_login', data={'password': 'admin'})
+    return client
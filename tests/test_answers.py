@@ -0,0 +1,40 @@
+import pytest
+
+from game_state import QUESTION_CLOSED, EventRejected
+
+
+def player(quiz_app, username):
+    client = quiz_app.app.test_client()
+    client.post('/login', data={'password': 'user'})
+    client.post('/userlogin', data={'username': username, 'avatar': 'a'})
+    return client
+
+
+def test_mark_correct_returns_only_the_toggled_answer(quiz_app, admin):
+    room = quiz_app.rooms.get(quiz_app.DEFAULT_ROOM)
+    answer_id = room.commit({'type': 'answer_submitted', 'question_id': room.current_question_id(), 'text': 'T',
+                             'username': 'bob', 'avatar': 'a', 'random_num': 1})
+
+    first = admin.post('/mark_correct', json={'answer_id': answer_id}).get_json()
+    second = admin.post('/mark_correct', json={'answer_id': answer_id}).get_json()
+
+    assert first == {'success': True, 'answer_id': answer_id, 'is_correct': True}
+    assert second['is_correct'] is False
+
+
+def test_answers_to_an_earlier_question_are_refused(quiz_app):
+    room = quiz_app.rooms.get(quiz_app.DEFAULT_ROOM)
+    room.commit({'type': 'current_question_set', 'question': {'id': 1, 'text': 'First'}})
+    room.commit({'type': 'current_question_set', 'question': {'id': 2, 'text': 'Second'}})
+    client = player(quiz_app, 'late')
+
+    late = client.post('/submit_answer', json={'answer': 'A', 'avatar': 'a', 'question_id': 1})
+    assert late.status_code == 409
+    assert late.get_json()['message'] == QUESTION_CLOSED
+    with pytest.raises(EventRejected):
+        room.commit({'type': 'answer_submitted', 'question_id': 1, 'text': 'A',
+                     'username': 'late', 'avatar': 'a', 'random_num': 1})
+
+    current = client.post('/submit_answer', json={'answer': 'B', 'avatar': 'a', 'question_id': 2})
+    assert current.status_code == 200
+    assert [answer['question_id'] for answer in room.data['answers']] == [2]
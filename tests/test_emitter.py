@@ -0,0 +1,42 @@
+import threading
+import time
+
+from emitter import CoalescingEmitter
+
+
+class FakeSocketIO:
+    """Records emits; the first one waits until ``release`` is set."""
+
+    def __init__(self):
+        self.sent = []
+        self.sending = threading.Event()
+        self.release = threading.Event()
+
+    def emit(self, event, data=None, to=None):
+        if not self.sent and not self.sending.is_set():
+            self.sending.set()
+            self.release.wait(5)
+        self.sent.append((event, data, to))
+
+    def start_background_task(self, target):
+        threading.Thread(target=target, daemon=True).start()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+def test_overlapping_flushes_keep_deltas_in_order():
+    socketio = FakeSocketIO()
+    emitter = CoalescingEmitter(socketio, window=0)
+    first = threading.Thread(target=emitter.emit_delta, args=('room', 0, 1, [{'type': 'a', 'version': 1}]))
+    first.start()
+    assert socketio.sending.wait(5)
+    second = threading.Thread(target=emitter.emit_delta, args=('room', 1, 2, [{'type': 'b', 'version': 2}]))
+    second.start()
+    time.sleep(0.1)
+    socketio.release.set()
+    first.join(5)
+    second.join(5)
+
+    versions = [data['version'] for event, data, to in socketio.sent if to == 'room']
+    assert versions == [1, 2]
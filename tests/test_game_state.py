@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from game_state import EventRejected, GameState
+from storage import JsonStorage, SqliteStorage
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = GameState(JsonStorage(str(tmp_path / 'game_data.json'), str(tmp_path / 'game_data.backup.json')))
+    state.start()
+    yield state
+    state.stop()
+
+
+def commit_within(state, event, timeout=5):
+    """Commits from another thread so a stuck writer fails the test instead of hanging it."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = state.commit(event)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"commit of {event['type']} did not return"
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def test_malformed_score_change_is_rejected(state):
+    commit_within(state, {'type': 'user_joined', 'username': 'bob', 'avatar': 'a.webp'})
+    with pytest.raises(EventRejected):
+        commit_within(state, {'type': 'score_changed', 'username': 'bob', 'delta': None})
+    assert commit_within(state, {'type': 'score_changed', 'username': 'bob', 'delta': 2}) == 2
+
+
+def test_failing_handler_does_not_stop_the_writer(state, monkeypatch):
+    def broken(event):
+        raise TypeError('broken handler')
+
+    monkeypatch.setattr(state, '_on_score_changed', broken, raising=False)
+    commit_within(state, {'type': 'user_joined', 'username': 'bob', 'avatar': 'a.webp'})
+    with pytest.raises(TypeError):
+        commit_within(state, {'type': 'score_changed', 'username': 'bob', 'delta': 1})
+    version = state.version
+    monkeypatch.undo()
+
+    assert commit_within(state, {'type': 'score_changed', 'username': 'bob', 'delta': 1}) == 1
+    assert state.version == version + 1
+
+
+def test_failing_group_is_rolled_back(state, monkeypatch):
+    commit_within(state, {'type': 'user_joined', 'username': 'bob', 'avatar': 'a.webp'})
+
+    def broken(event):
+        state.data['users'].clear()
+        raise TypeError('broken handler')
+
+    monkeypatch.setattr(state, '_on_user_deleted', broken, raising=False)
+    with pytest.raises(TypeError):
+        state.commit_many([{'type': 'score_changed', 'username': 'bob', 'delta': 3},
+                           {'type': 'user_deleted', 'username': 'bob'}])
+    assert [user['score'] for user in state.data['users']] == [0]
+
+
+def test_failed_sqlite_write_is_rewritten_on_flush(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'game_data.db')
+    json_path = str(tmp_path / 'game_data.json')
+    state = GameState(SqliteStorage(db_path, json_path))
+    state.commit({'type': 'user_joined', 'username': 'bob', 'avatar': 'a.webp'})
+
+    def fail(events, data):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(state.storage, 'append', fail)
+    state.commit({'type': 'score_changed', 'username': 'bob', 'delta': 3})
+    monkeypatch.undo()
+    state.commit({'type': 'score_changed', 'username': 'bob', 'delta': 2})
+    assert state.flush()
+    state.storage.close()
+
+    saved = SqliteStorage(db_path, json_path).read_all()
+    assert [user['score'] for user in saved['users']] == [5]
+    assert saved['version'] == state.version
+
+
+def test_reveal_and_next_question_in_one_sqlite_batch(tmp_path):
+    db_path = str(tmp_path / 'game_data.db')
+    json_path = str(tmp_path / 'game_data.json')
+    state = GameState(SqliteStorage(db_path, json_path))
+    for username in ('ann', 'bob'):
+        state.commit({'type': 'user_joined', 'username': username, 'avatar': 'a.webp'})
+    state.commit({'type': 'current_question_set', 'question': {'id': 1, 'text': 'Q1'}})
+    answer_id = state.commit({'type': 'answer_submitted', 'question_id': 1, 'text': 'A',
+                              'username': 'ann', 'avatar': 'a.webp', 'random_num': 1})
+    state.commit({'type': 'vote_cast', 'answer_id': answer_id, 'username': 'bob', 'avatar': 'a.webp'})
+
+    state.commit_many([{'type': 'votes_revealed'},
+                       {'type': 'score_changed', 'username': 'ann', 'delta': 1},
+                       {'type': 'current_question_set', 'question': {'id': 2, 'text': 'Q2'}}])
+
+    saved = SqliteStorage(db_path, json_path).read_all()
+    assert {user['username']: user['score'] for user in saved['users']} == {'ann': 3, 'bob': 0}
+    assert saved['version'] == state.version
+    assert not state._resync
+    state.storage.close()
+
+
+def test_votes_are_scored_once_per_question(state):
+    for username in ('ann', 'bob', 'cat'):
+        commit_within(state, {'type': 'user_joined', 'username': username, 'avatar': 'a.webp'})
+    commit_within(state, {'type': 'current_question_set', 'question': {'id': 1, 'text': 'Q1'}})
+    right = commit_within(state, {'type': 'answer_submitted', 'question_id': 1, 'text': 'Right',
+                                  'username': 'ann', 'avatar': 'a.webp', 'random_num': 1})
+    wrong = commit_within(state, {'type': 'answer_submitted', 'question_id': 1, 'text': 'Wrong',
+                                  'username': 'bob', 'avatar': 'a.webp', 'random_num': 2})
+    commit_within(state, {'type': 'answer_correct_toggled', 'answer_id': right})
+    commit_within(state, {'type': 'vote_cast', 'answer_id': right, 'username': 'cat', 'avatar': 'a.webp'})
+    commit_within(state, {'type': 'vote_cast', 'answer_id': wrong, 'username': 'ann', 'avatar': 'a.webp'})
+
+    # Voters for the right answer get 1, the author of a wrong one 2 per vote it fooled
+    assert commit_within(state, {'type': 'votes_revealed'}) == {'cat': 1, 'bob': 2}
+    assert commit_within(state, {'type': 'votes_revealed'}) == {'cat': 1, 'bob': 2}
+    assert {user['username']: user['score'] for user in state.data['users']} == {'ann': 0, 'bob': 2, 'cat': 1}
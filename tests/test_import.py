@@ -0,0 +1,61 @@
+import json
+
+
+def import_records(client, records):
+    body = ''.join(json.dumps(record) + '\n' for record in records)
+    return client.post('/import', data=body, content_type='application/x-ndjson')
+
+
+def room(quiz_app):
+    return quiz_app.rooms.get(quiz_app.DEFAULT_ROOM)
+
+
+def test_invalid_round_is_rejected_before_anything_changes(quiz_app, admin):
+    assert import_records(admin, [{'type': 'user', 'username': 'kept', 'avatar': 'a'}]).status_code == 200
+    rounds = admin.get('/history').get_json()['total']
+
+    response = import_records(admin, [
+        {'type': 'game'},
+        {'type': 'user', 'username': 'new', 'avatar': 'a'},
+        {'type': 'round', 'question': {'id': 1, 'text': 'Q'}, 'answers': [1, 2]},
+    ])
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Line 3: invalid answers'
+    assert [user['username'] for user in room(quiz_app).data['users']] == ['kept']
+    history = admin.get('/history')
+    assert history.status_code == 200
+    assert history.get_json()['total'] == rounds
+
+
+def test_round_question_must_have_an_id_and_text(admin):
+    response = import_records(admin, [{'type': 'round', 'question': {'id': 1}, 'answers': []}])
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Line 1: missing text of the question'
+
+
+def test_answer_defaults_are_filled_in(quiz_app, admin):
+    response = import_records(admin, [
+        {'type': 'user', 'username': 'bob', 'avatar': 'a'},
+        {'type': 'answer', 'id': 7, 'text': 'T', 'username': 'bob', 'avatar': 'a'},
+    ])
+    assert response.status_code == 200
+
+    assert room(quiz_app).data['users'][0]['score'] == 0
+    answer = room(quiz_app).data['answers'][0]
+    assert answer['visible'] is False
+    assert answer['votes'] == []
+    assert isinstance(answer['random_num'], int)
+    toggled = admin.post('/toggle_answer_visibility', json={'answer_id': 7})
+    assert toggled.status_code == 200
+
+
+def test_invalid_answer_fields_are_rejected(admin):
+    answer = {'type': 'answer', 'id': 7, 'text': 'T', 'username': 'bob', 'avatar': 'a'}
+    for field, value, message in [('visible', 'yes', 'invalid visible'),
+                                  ('question_id', 'q', 'invalid question_id'),
+                                  ('random_num', True, 'invalid random_num'),
+                                  ('votes', [{'avatar': 'a'}], 'missing username of a vote')]:
+        response = import_records(admin, [dict(answer, **{field: value})])
+        assert response.status_code == 400
+        assert response.get_json()['message'] == f'Line 1: {message}'
@@ -0,0 +1,27 @@
+from leaderboard import Leaderboard
+
+
+def board():
+    return Leaderboard([{'username': 'ann', 'score': 5}, {'username': 'bob', 'score': 7},
+                        {'username': 'cat', 'score': 5}, {'username': 'dan', 'score': None}])
+
+
+def test_ties_share_a_competition_rank():
+    leaderboard = board()
+    assert leaderboard.top() == [(1, 'bob', 7), (2, 'ann', 5), (2, 'cat', 5), (4, 'dan', 0)]
+    assert [leaderboard.rank(name) for name in ('bob', 'ann', 'cat', 'dan')] == [1, 2, 2, 4]
+    assert leaderboard.rank('eve') is None
+
+
+def test_a_page_starting_inside_a_tie_keeps_the_shared_rank():
+    assert board().page(2, 2) == [(2, 'cat', 5), (4, 'dan', 0)]
+
+
+def test_updates_and_removals_keep_the_order():
+    leaderboard = board()
+    leaderboard.update('dan', 9)
+    leaderboard.update('eve', 5)
+    leaderboard.remove('bob')
+
+    assert leaderboard.top() == [(1, 'dan', 9), (2, 'ann', 5), (2, 'cat', 5), (2, 'eve', 5)]
+    assert len(leaderboard) == 4
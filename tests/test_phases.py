@@ -0,0 +1,28 @@
+def start_timed_round(quiz_app, admin, text):
+    room = quiz_app.rooms.get(quiz_app.DEFAULT_ROOM)
+    admin.post('/add_question', json={'text': text})
+    question_id = room.data['questions'][-1]['id']
+    response = admin.post('/set_next_question', json={'question_id': question_id,
+                                                      'answer_seconds': 60, 'voting_seconds': 60})
+    assert response.status_code == 200
+    return room, question_id
+
+
+def test_current_phase_is_a_copy(quiz_app, admin):
+    room, question_id = start_timed_round(quiz_app, admin, 'Copied phase')
+
+    phase = room.current_phase()
+    assert phase['name'] == 'answering' and phase['question_id'] == question_id
+    phase['name'] = 'voting'
+    assert room.current_phase()['name'] == 'answering'
+
+
+def test_advance_phase_moves_the_round_on(quiz_app, admin):
+    room, question_id = start_timed_round(quiz_app, admin, 'Advanced phase')
+    assert room.phase_refusal(question_id, 'answering') is None
+    assert room.phase_refusal(question_id, 'voting') == 'Voting is not open'
+
+    assert admin.post('/advance_phase').get_json()['phase']['name'] == 'voting'
+    assert room.phase_refusal(question_id, 'answering') == 'Answers are closed'
+    assert admin.post('/advance_phase').get_json()['phase']['name'] == 'reveal'
+    assert admin.post('/advance_phase').status_code == 409
@@ -0,0 +1,51 @@
+import pytest
+
+import ratelimit
+from ratelimit import TokenBucketLimiter, parse_budgets, retry_after_header
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_parse_budgets():
+    assert parse_budgets('vote=2:10, connect=0.5, off=0:3,') == {
+        'vote': (2.0, 10.0), 'connect': (0.5, 1.0), 'off': (0.0, 3.0)}
+
+
+def test_burst_then_steady_rate(clock):
+    limiter = TokenBucketLimiter({'vote': (2.0, 3.0)})
+    assert [limiter.acquire('vote', 'ann') for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire('vote', 'ann') == pytest.approx(0.5)
+    # Other clients have buckets of their own
+    assert limiter.acquire('vote', 'bob') == 0
+
+    clock[0] += 0.5
+    assert limiter.acquire('vote', 'ann') == 0
+    assert limiter.acquire('vote', 'ann') == pytest.approx(0.5)
+
+
+def test_unlimited_and_unknown_budgets(clock):
+    limiter = TokenBucketLimiter({'off': (0.0, 1.0)})
+    assert all(limiter.acquire(budget, 'ann') == 0 for budget in ('off', 'other') for _ in range(5))
+    assert len(limiter) == 0
+
+
+def test_full_buckets_are_swept(clock):
+    limiter = TokenBucketLimiter({'vote': (1.0, 2.0)}, sweep_interval=60)
+    limiter.acquire('vote', 'ann')
+    clock[0] += 30
+    limiter.acquire('vote', 'bob')
+    assert len(limiter) == 2
+
+    clock[0] += 31
+    limiter.acquire('vote', 'cat')
+    # bob's bucket had refilled too, so only cat's new one is left
+    assert len(limiter) == 1
+
+
+def test_retry_after_rounds_up():
+    assert [retry_after_header(seconds) for seconds in (0.01, 1.0, 1.2)] == ['1', '1', '2']
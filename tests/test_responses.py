@@ -0,0 +1,14 @@
+def test_cached_responses_have_strong_etags_per_encoding(admin):
+    plain = admin.get('/get_game_state')
+    gzipped = admin.get('/get_game_state', headers={'Accept-Encoding': 'gzip'})
+
+    assert not plain.headers['ETag'].startswith('W/')
+    assert not gzipped.headers['ETag'].startswith('W/')
+    assert plain.headers['ETag'] != gzipped.headers['ETag']
+    again = admin.get('/get_game_state', headers={'Accept-Encoding': 'gzip'})
+    assert again.get_data() == gzipped.get_data()
+
+    unchanged = admin.get('/get_game_state', headers={'Accept-Encoding': 'gzip',
+                                                      'If-None-Match': gzipped.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert unchanged.headers['ETag'] == gzipped.headers['ETag']
@@ -0,0 +1,82 @@
+import os
+
+from game_state import GameState
+from storage import SqliteStorage, WalStorage
+
+
+def wal_state(tmp_path, **options):
+    return GameState(WalStorage(str(tmp_path / 'game_data.json'), str(tmp_path / 'game_data.backup.json'),
+                                **options))
+
+
+def scores(state):
+    return {user['username']: user['score'] for user in state.data['users']}
+
+
+def test_logged_events_are_replayed_on_startup(tmp_path):
+    state = wal_state(tmp_path)
+    state.commit({'type': 'user_joined', 'username': 'ann', 'avatar': 'a.webp'})
+    state.commit({'type': 'score_changed', 'username': 'ann', 'delta': 4})
+    # No snapshot: the changes are only in the log
+    state.storage.close()
+    assert not os.path.exists(tmp_path / 'game_data.json')
+
+    replayed = wal_state(tmp_path)
+    assert scores(replayed) == {'ann': 4}
+    assert replayed.version == state.version
+    replayed.storage.close()
+
+
+def test_snapshot_compacts_the_log(tmp_path):
+    state = wal_state(tmp_path)
+    state.commit({'type': 'user_joined', 'username': 'ann', 'avatar': 'a.webp'})
+    state.commit({'type': 'score_changed', 'username': 'ann', 'delta': 4})
+    assert state.flush()
+    assert os.path.getsize(tmp_path / 'game_data.wal') == 0
+    assert not os.path.exists(tmp_path / 'game_data.wal.1')
+
+    state.commit({'type': 'score_changed', 'username': 'ann', 'delta': 1})
+    state.storage.close()
+    reopened = wal_state(tmp_path)
+    assert scores(reopened) == {'ann': 5}
+    assert reopened.version == 3
+    reopened.storage.close()
+
+
+def test_snapshot_is_synced_before_the_old_segment_is_removed(tmp_path, monkeypatch):
+    calls = []
+    real_fsync, real_remove = os.fsync, os.remove
+    monkeypatch.setattr(os, 'fsync', lambda fd: (calls.append('fsync'), real_fsync(fd)))
+    monkeypatch.setattr(os, 'remove', lambda path: (calls.append('remove'), real_remove(path)))
+    state = wal_state(tmp_path, fsync=False)
+    state.commit({'type': 'user_joined', 'username': 'ann', 'avatar': 'a.webp'})
+    assert calls == []
+
+    assert state.flush()
+    assert calls == ['fsync', 'fsync', 'remove']
+    state.storage.close()
+
+
+def test_sqlite_rows_match_the_state_after_every_kind_of_event(tmp_path):
+    db_path, json_path = str(tmp_path / 'game_data.db'), str(tmp_path / 'game_data.json')
+    state = GameState(SqliteStorage(db_path, json_path))
+    for username in ('ann', 'bob', 'gone'):
+        state.commit({'type': 'user_joined', 'username': username, 'avatar': 'a.webp'})
+    state.commit({'type': 'user_deleted', 'username': 'gone'})
+    state.commit({'type': 'question_added', 'text': 'Q1'})
+    state.commit({'type': 'question_added', 'text': 'Q2'})
+    state.commit({'type': 'current_question_set', 'question': {'id': 1, 'text': 'Q1'}})
+    answer_id = state.commit({'type': 'answer_submitted', 'question_id': 1, 'text': 'A',
+                              'username': 'ann', 'avatar': 'a.webp', 'random_num': 7})
+    state.commit({'type': 'answer_visibility_toggled', 'answer_id': answer_id})
+    state.commit({'type': 'vote_cast', 'answer_id': answer_id, 'username': 'bob', 'avatar': 'a.webp'})
+    state.commit({'type': 'score_changed', 'username': 'bob', 'delta': 3})
+    state.commit({'type': 'votes_revealed'})
+    state.storage.close()
+
+    saved = SqliteStorage(db_path, json_path).read_all()
+    for key in ('users', 'questions', 'answers', 'current_question', 'round_points', 'reveal', 'version'):
+        assert saved[key] == state.data[key], key
+    reopened = GameState(SqliteStorage(db_path, json_path))
+    assert reopened.leaderboard()[0] == state.leaderboard()[0]
+    reopened.storage.close()
@@ -0,0 +1,56 @@
+"""Runs the game as several worker processes behind one reverse proxy.
+
+Worker 0 is the primary: it owns the game data and hosts the message bus.
+Worker N listens on PORT + N; point the reverse proxy at all of them (see
+the Caddyfile). Settings come from the environment, like app.py:
+
+    WORKERS=4 PORT=5000 python workers.py
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+WORKERS = int(os.getenv('WORKERS', str(os.cpu_count() or 1)))
+PORT = int(os.getenv('PORT', '5000'))
+
+
+def main():
+    # systemd and docker stop send SIGTERM; it stops the workers like a worker exiting does
+    terminated = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    processes = []
+    for worker_id in range(WORKERS):
+        env = dict(os.environ, WORKERS=str(WORKERS), WORKER_ID=str(worker_id),
+                   PORT=str(PORT + worker_id))
+        processes.append(subprocess.Popen([sys.executable, app_path], env=env))
+        print(f"Worker {worker_id} started on port {PORT + worker_id}")
+        if worker_id == 0:
+            # Let the primary load the data and open the bus first
+            time.sleep(1)
+
+    try:
+        while not terminated and all(process.poll() is None for process in processes):
+            time.sleep(1)
+        print("Stopping the workers" if terminated else "A worker exited; stopping the others")
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the workers too; give them time to shut down on their own
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and any(p.poll() is None for p in processes):
+            time.sleep(0.2)
+    for process in processes:
+        if process.poll() is None:
+            # SIGINT lets the workers write out pending changes on the way down
+            if os.name == 'nt':
+                process.terminate()
+            else:
+                process.send_signal(signal.SIGINT)
+    for process in processes:
+        process.wait()
+    return max(process.returncode or 0 for process in processes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())